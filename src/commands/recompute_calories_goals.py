@@ -0,0 +1,137 @@
+"""
+Recomputes the stored `User.bmr` / `User.calories_goal` values, e.g. after the nutrition formulas change.
+
+    cd src && python -m commands.recompute_calories_goals [--dry-run] [--checkpoint PATH]
+
+Users are streamed page by page with Datastore cursors and only changed entities are written back.
+The cursor of the last written page is checkpointed, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+from google.cloud import ndb
+from mealhow_sdk.datastore_models import User
+
+from core import nutrition
+from core.clients import ndb_client
+from core.logger import get_logger
+from services.user import get_latest_weight_record
+
+logger = get_logger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = ".recompute_calories_goals.json"
+
+
+def load_checkpoint(path: str) -> dict[str, Any]:
+    if not os.path.exists(path):
+        return {"cursor": None, "scanned": 0, "updated": 0}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+
+    os.replace(tmp_path, path)
+
+
+def is_user_complete(user: User) -> bool:
+    return (
+        bool(user.current_weight and user.height_cm and user.birth_year)
+        and user.biological_sex in nutrition.HARRIS_BENEDICT_COEFFICIENTS
+        and user.activity_level in nutrition.ACTIVITY_LEVEL_ADJUSTMENTS
+        and user.goal in nutrition.GOAL_ADJUSTMENTS
+    )
+
+
+def get_changed_users(users: list[User]) -> list[tuple[User, int, int]]:
+    """
+    Recomputes a page of users in one vectorized pass and returns `(user, bmr, calories_goal)` for those that differ.
+    """
+    users = [user for user in users if is_user_complete(user)]
+    if not users:
+        return []
+
+    now = datetime.datetime.now()
+    bmrs, calories_goals = nutrition.get_bmr_and_calories_goal_batch(
+        weight_kg=[get_latest_weight_record(user.current_weight).weight_kg for user in users],
+        height_cm=[user.height_cm for user in users],
+        age=[relativedelta(now, user.birth_year).years for user in users],
+        sex=[user.biological_sex for user in users],
+        activity_level=[user.activity_level for user in users],
+        goal=[user.goal for user in users],
+    )
+    return [
+        (user, int(bmr), int(calories_goal))
+        for user, bmr, calories_goal in zip(users, bmrs, calories_goals)
+        if (user.bmr, user.calories_goal) != (bmr, calories_goal)
+    ]
+
+
+def recompute_calories_goals(page_size: int, put_batch_size: int, checkpoint_path: str, dry_run: bool) -> None:
+    checkpoint = load_checkpoint(checkpoint_path)
+    cursor = ndb.Cursor(urlsafe=checkpoint["cursor"]) if checkpoint["cursor"] else None
+    if cursor:
+        logger.info("Resuming after %s scanned users", checkpoint["scanned"])
+
+    with ndb_client.context():
+        more = True
+        while more:
+            users, cursor, more = User.query().fetch_page(page_size, start_cursor=cursor)
+            changed_users = get_changed_users(users)
+
+            for user, bmr, calories_goal in changed_users:
+                logger.info(
+                    "%s: bmr %s -> %s, calories_goal %s -> %s",
+                    user.key.id(),
+                    user.bmr,
+                    bmr,
+                    user.calories_goal,
+                    calories_goal,
+                )
+                user.bmr = bmr
+                user.calories_goal = calories_goal
+
+            checkpoint["scanned"] += len(users)
+            checkpoint["updated"] += len(changed_users)
+            if dry_run:
+                continue
+
+            for i in range(0, len(changed_users), put_batch_size):
+                ndb.put_multi([user for user, _, _ in changed_users[i : i + put_batch_size]])
+
+            checkpoint["cursor"] = cursor.urlsafe().decode("utf-8") if more and cursor else None
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    logger.info(
+        "%s %s of %s scanned users",
+        "Would update" if dry_run else "Updated",
+        checkpoint["updated"],
+        checkpoint["scanned"],
+    )
+    if not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--put-batch-size", type=int, default=100)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH, help="file used to resume an interrupted run")
+    args = parser.parse_args()
+
+    asyncio.run(nutrition.load_adjustments())
+    recompute_calories_goals(args.page_size, args.put_batch_size, args.checkpoint, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
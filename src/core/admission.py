@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from core import custom_exceptions
+from core.metrics import metrics
+
+
+class AdmissionController:
+    """
+    Caps concurrent calls to a slow upstream. Up to `max_concurrency` calls run at once and up to `max_queue_size`
+    more wait for a slot; beyond that calls are shed with 429. `timeout` is the deadline for the whole call,
+    queueing included.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+
+    def has_capacity(self) -> bool:
+        return not self.semaphore.locked()
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        if self.semaphore.locked() and self.waiting >= self.max_queue_size:
+            metrics.increment(f"admission.{self.name}.shed")
+            raise custom_exceptions.TooManyRequestsException("Too many requests, please try again later")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            metrics.increment(f"admission.{self.name}.queue_timeout")
+            raise custom_exceptions.ServiceUnavailableException("Service is busy, please try again later")
+        finally:
+            self.waiting -= 1
+
+        metrics.increment(f"admission.{self.name}.admitted")
+        try:
+            return await asyncio.wait_for(func(), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            metrics.increment(f"admission.{self.name}.timeout")
+            raise custom_exceptions.GatewayTimeoutException("Upstream request timed out")
+        finally:
+            self.semaphore.release()
@@ -1,16 +1,27 @@
+import asyncio
+import hashlib
+import time
 from typing import NamedTuple
 
+import aiohttp
 import jwt
 from starlette.requests import Request as StarletteRequest
 
+from core.cache import TTLCache
+from core.concurrency import SingleFlight
 from core.config import get_settings
 from core.custom_exceptions import (
     BadCredentialsException,
     RequiresAuthenticationException,
     UnableCredentialsException,
 )
+from core.http_client import http_client
+from core.logger import get_logger
 
 settings = get_settings()
+logger = get_logger(__name__)
+
+verified_token_claims = TTLCache(max_size=settings.JWT_CLAIMS_CACHE_SIZE)
 
 
 class AuthorizationHeaderElements(NamedTuple):
@@ -43,12 +54,86 @@ def get_bearer_token(request: StarletteRequest) -> str:
         raise RequiresAuthenticationException
 
 
-def verify_jwt_token(jwt_access_token: str, jwks_client: jwt.PyJWKClient) -> dict:
+class JWKSKeyStore:
+    """
+    Async JWKS signing key store. Keys are served from memory and refreshed in the background once they are older
+    than `JWKS_REFRESH_INTERVAL` (stale-while-revalidate). An unknown `kid` triggers at most one refresh per
+    `JWKS_MIN_REFRESH_INTERVAL`, shared by every request waiting on it.
+    """
+
+    def __init__(self, jwks_url: str) -> None:
+        self.jwks_url = jwks_url
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self.fetched_at: float | None = None
+        self.single_flight = SingleFlight()
+        self.refresh_task: asyncio.Task | None = None
+
+    async def fetch(self) -> None:
+        try:
+            async with http_client().get(self.jwks_url) as response:
+                response.raise_for_status()
+                jwks = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise jwt.exceptions.PyJWKClientError(f"Failed to fetch JWKS: {e}")
+
+        self.keys = {
+            jwk["kid"]: jwt.PyJWK(jwk)
+            for jwk in jwks.get("keys", [])
+            if jwk.get("use", "sig") == "sig" and "kid" in jwk
+        }
+        self.fetched_at = time.monotonic()
+
+    async def refresh(self) -> None:
+        await self.single_flight.do("jwks", self.fetch)
+
+    async def refresh_in_background(self) -> None:
+        try:
+            await self.refresh()
+        except jwt.exceptions.PyJWKClientError:
+            logger.exception("Background JWKS refresh failed")
+
+    async def warm_up(self) -> None:
+        try:
+            await self.refresh()
+        except jwt.exceptions.PyJWKClientError:
+            logger.exception("JWKS warm-up failed, keys will be fetched on first use")
+
+    def age(self) -> float:
+        return float("inf") if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+    async def get_signing_key(self, kid: str | None) -> jwt.PyJWK:
+        key = self.keys.get(kid) if kid else None
+        if key is not None:
+            if self.age() > settings.JWKS_REFRESH_INTERVAL and (self.refresh_task is None or self.refresh_task.done()):
+                self.refresh_task = asyncio.create_task(self.refresh_in_background())
+
+            return key
+
+        if self.age() > settings.JWKS_MIN_REFRESH_INTERVAL or self.single_flight.is_running("jwks"):
+            await self.refresh()
+            key = self.keys.get(kid) if kid else None
+
+        if key is None:
+            raise jwt.exceptions.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+
+        return key
+
+
+async def verify_jwt_token(jwt_access_token: str, key_store: JWKSKeyStore) -> dict:
+    """
+    Verify the token and return its claims. Verified claims are cached by token hash until the token expires,
+    so repeated requests with the same bearer token skip the signature check.
+    """
+    token_hash = hashlib.sha256(jwt_access_token.encode("utf-8")).hexdigest()
+    claims = verified_token_claims.get(token_hash)
+    if claims is not None:
+        return claims
+
     try:
-        jwt_signing_key = jwks_client.get_signing_key_from_jwt(jwt_access_token).key
-        return jwt.decode(
+        jwt_signing_key = await key_store.get_signing_key(jwt.get_unverified_header(jwt_access_token).get("kid"))
+        claims = jwt.decode(
             jwt_access_token,
-            jwt_signing_key,
+            jwt_signing_key.key,
             algorithms=settings.AUTH0_ALGORITHMS,
             audience=settings.AUTH0_API_DEFAULT_AUDIENCE,
             issuer=f"https://{settings.AUTH0_DOMAIN}/",
@@ -57,3 +142,8 @@ def verify_jwt_token(jwt_access_token: str, jwks_client: jwt.PyJWKClient) -> dic
         raise UnableCredentialsException
     except jwt.exceptions.InvalidTokenError:
         raise BadCredentialsException
+
+    if "exp" in claims:
+        verified_token_claims.set(token_hash, claims, ttl=claims["exp"] - time.time())
+
+    return claims
@@ -0,0 +1,242 @@
+import abc
+import pickle  # nosec B403
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+import redis.asyncio as aioredis
+from google.cloud import ndb
+from redis.exceptions import RedisError
+
+from core.config import get_settings
+from core.logger import get_logger
+from core.metrics import metrics
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with per-entry expiry.
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[key]
+            return default
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:  # noqa: A003
+        ttl = self.ttl if ttl is None else ttl
+        self.entries[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class CacheBackend(abc.ABC):
+    """
+    Shared cache tier used behind the in-process LRU.
+    """
+
+    @abc.abstractmethod
+    async def get_multi(self, keys: list[str]) -> list[bytes | None]:
+        ...
+
+    @abc.abstractmethod
+    async def set_multi(self, items: dict[str, bytes], ttl: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    In-memory stand-in for a shared backend, for local runs and tests.
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.cache = TTLCache(max_size=max_size)
+
+    async def get_multi(self, keys: list[str]) -> list[bytes | None]:
+        return [self.cache.get(key) for key in keys]
+
+    async def set_multi(self, items: dict[str, bytes], ttl: int) -> None:
+        for key, value in items.items():
+            self.cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+    async def close(self) -> None:
+        self.cache.clear()
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis-backed shared tier. Errors are logged and treated as misses, so an unavailable Redis only costs latency.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.client = aioredis.from_url(url)
+
+    async def get_multi(self, keys: list[str]) -> list[bytes | None]:
+        try:
+            values: list[bytes | None] = await self.client.mget(keys)
+        except RedisError:
+            logger.exception("Shared cache read failed")
+            return [None] * len(keys)
+
+        return values
+
+    async def set_multi(self, items: dict[str, bytes], ttl: int) -> None:
+        try:
+            async with self.client.pipeline(transaction=False) as pipeline:
+                for key, value in items.items():
+                    pipeline.set(key, value, ex=ttl)
+                await pipeline.execute()
+        except RedisError:
+            logger.exception("Shared cache write failed")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(key)
+        except RedisError:
+            logger.exception("Shared cache delete failed")
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def get_shared_cache_backend() -> CacheBackend | None:
+    if settings.ENTITY_CACHE_REDIS_URL:
+        return RedisCacheBackend(settings.ENTITY_CACHE_REDIS_URL)
+
+    return None
+
+
+class EntityCache:
+    """
+    Two-tier read-through cache for ndb entities of the given kinds: an in-process LRU in front of an optional
+    shared backend. Both tiers hold pickled entities, so every read hands out its own copy that callers may
+    mutate. An invalidation bumps the version of a key that is being loaded, so a load that started before the
+    invalidation never writes its stale result back into the cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kinds: set[str],
+        backend: CacheBackend | None = None,
+        cacheable: Callable[[Any], bool] | None = None,
+    ) -> None:
+        self.name = name
+        self.kinds = kinds
+        self.backend = backend
+        self.cacheable = cacheable or (lambda entity: True)
+        self.local = TTLCache(max_size=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_LOCAL_TTL)
+        # Versions and the number of in-flight loads of the keys being loaded
+        self.versions: dict[ndb.Key, int] = {}
+        self.loads: dict[ndb.Key, int] = {}
+
+    def backend_key(self, key: ndb.Key) -> str:
+        return f"{self.name}:{key.urlsafe().decode('utf-8')}"
+
+    async def get_multi(self, keys: list[ndb.Key], fetch: Callable[[list[ndb.Key]], Awaitable[list[Any]]]) -> list[Any]:
+        found: dict[ndb.Key, Any] = {}
+        for key in keys:
+            if key.kind() in self.kinds and (value := self.local.get(key)) is not None:
+                found[key] = pickle.loads(value)  # nosec B301 - values are only written by this cache
+        metrics.increment(f"cache.{self.name}.hit.local", len(found))
+
+        shared_keys = list(dict.fromkeys(key for key in keys if key not in found and key.kind() in self.kinds))
+        if self.backend is not None and shared_keys:
+            values = await self.backend.get_multi([self.backend_key(key) for key in shared_keys])
+            for key, value in zip(shared_keys, values):
+                if value is not None:
+                    found[key] = pickle.loads(value)  # nosec B301 - values are only written by this cache
+                    self.local.set(key, value)
+                    metrics.increment(f"cache.{self.name}.hit.shared")
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            metrics.increment(f"cache.{self.name}.miss", len(missing))
+            versions = self.start_loads(missing)
+            try:
+                entities = await fetch(missing)
+                shared_items = {}
+                for key, entity in zip(missing, entities):
+                    found[key] = entity
+                    if (
+                        entity is not None
+                        and key.kind() in self.kinds
+                        and self.cacheable(entity)
+                        and self.versions[key] == versions[key]
+                    ):
+                        value = pickle.dumps(entity)
+                        self.local.set(key, value)
+                        shared_items[self.backend_key(key)] = value
+            finally:
+                self.finish_loads(missing)
+
+            if self.backend is not None and shared_items:
+                await self.backend.set_multi(shared_items, settings.ENTITY_CACHE_SHARED_TTL)
+
+        return [found[key] for key in keys]
+
+    def start_loads(self, keys: list[ndb.Key]) -> dict[ndb.Key, int]:
+        for key in keys:
+            self.loads[key] = self.loads.get(key, 0) + 1
+            self.versions.setdefault(key, 0)
+
+        return {key: self.versions[key] for key in keys}
+
+    def finish_loads(self, keys: list[ndb.Key]) -> None:
+        for key in keys:
+            self.loads[key] -= 1
+            if not self.loads[key]:
+                del self.loads[key]
+                del self.versions[key]
+
+    async def get(self, key: ndb.Key, fetch: Callable[[list[ndb.Key]], Awaitable[list[Any]]]) -> Any:
+        return (await self.get_multi([key], fetch))[0]
+
+    async def invalidate(self, key: ndb.Key) -> None:
+        if key in self.versions:
+            self.versions[key] += 1
+        self.local.delete(key)
+        metrics.increment(f"cache.{self.name}.invalidation")
+        if self.backend is not None:
+            await self.backend.delete(self.backend_key(key))
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
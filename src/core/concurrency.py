@@ -0,0 +1,51 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Hashable
+
+from core.metrics import metrics
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls sharing a key into one in-flight awaitable, so a cache miss or refresh
+    triggered by many requests at once only does the work a single time.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, asyncio.Future] = {}
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self.calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.calls[key] = future
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+
+        # Shielded, so a cancelled caller does not cancel the call for everyone else waiting on it
+        return await asyncio.shield(future)
+
+
+def single_flight(name: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """
+    Makes concurrent calls of a read function with the same (hashable) arguments, which start with the user id,
+    share one in-flight call and its result or exception. Calls joining an in-flight one are counted in the
+    `single_flight.<name>.coalesced` metric. Callers get the same returned object, so they must not mutate it.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        flights = SingleFlight()
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = (args, tuple(sorted(kwargs.items())))
+            if flights.is_running(key):
+                metrics.increment(f"single_flight.{name}.coalesced")
+
+            return await flights.do(key, functools.partial(func, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
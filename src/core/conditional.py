@@ -0,0 +1,60 @@
+import hashlib
+from typing import Any, Hashable
+
+from fastapi import Response, status
+
+from core.cache import TTLCache
+from core.config import get_settings
+
+settings = get_settings()
+
+# Clients may store the response, but have to revalidate it with If-None-Match on every use
+REVALIDATE = "private, no-cache"
+# Content that no longer changes once generated
+STABLE = "private, max-age=3600"
+
+NOT_MODIFIED_RESPONSE = {304: {"description": "Resource has not changed since the ETag sent in If-None-Match"}}
+
+# ETags of immutable resources, keyed by resource. A matching If-None-Match is answered from here without
+# reading Datastore. Stamps are local to the instance and never invalidated, so only resources that can no longer
+# change or be deleted (e.g. archived meal plans) may be stamped.
+etag_stamps = TTLCache(settings.ETAG_STAMP_CACHE_SIZE, settings.ETAG_STAMP_TTL)
+
+
+def get_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(":".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def get_entity_etag(entity: Any) -> str:
+    """
+    Strong ETag from the entity key and its `updated_at` stamp, falling back to its full content.
+    """
+    updated_at = getattr(entity, "updated_at", None)
+    return get_etag(entity.key.urlsafe().decode("utf-8"), updated_at.isoformat() if updated_at else entity.to_dict())
+
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    if not if_none_match or not etag:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def get_cache_headers(etag: str, cache_control: str = REVALIDATE) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=get_cache_headers(etag, cache_control))
+
+
+def get_etag_stamp(key: Hashable) -> str | None:
+    return etag_stamps.get(key)
+
+
+def set_etag_stamp(key: Hashable, etag: str) -> None:
+    etag_stamps.set(key, etag)
@@ -24,6 +24,7 @@ class Settings(BaseSettings):
         "/error",
         "/openapi.json",
         "/api/v1/meal-plans/preview",
+        "/api/v1/meal-plans/preview/stream",
     }
 
     # Custom headers
@@ -33,6 +34,12 @@ class Settings(BaseSettings):
     CLIENT_PROTOCOL_HEADER: str = "X-Client-Protocol"
     CLIENT_LAT_LONG_HEADER: str = "X-Client-Lat-Long"
 
+    # Geo enrichment of signup headers
+    GEO_TIMEZONE_CACHE_SIZE: int = 10000
+    GEO_TIMEZONE_GRID_PRECISION: int = 2
+    # Loads the timezone polygons in the background after startup instead of on the first signup
+    GEO_WARM_UP_ON_STARTUP: bool = False
+
     # Elastic APM configuration
     ELASTIC_APM_SERVER_URL: str = ""
     ELASTIC_APM_ENABLED: bool = False
@@ -51,11 +58,15 @@ class Settings(BaseSettings):
     AUTH0_TEST_USERNAME: str
     AUTH0_TEST_PASSWORD: str
     AUTH0_CALLBACK_URL: str = "http://localhost/login/callback"
+    JWKS_REFRESH_INTERVAL: int = 3600
+    JWKS_MIN_REFRESH_INTERVAL: int = 30
+    JWT_CLAIMS_CACHE_SIZE: int = 10000
 
     # Auth0 Management API
     AUTH0_MANAGEMENT_API_CLIENT_ID: str
     AUTH0_MANAGEMENT_API_CLIENT_SECRET: str
     AUTH0_MANAGEMENT_API_AUDIENCE: str
+    AUTH0_MANAGEMENT_API_TOKEN_LEEWAY: int = 300
 
     # Google Cloud
     GCLOUD_SERVICE_ACCOUNT: str = "../sa.json"
@@ -64,10 +75,67 @@ class Settings(BaseSettings):
     PUBSUB_MEAL_PLAN_EVENT_TOPIC_ID: str
     PUBSUB_SHOPPING_LIST_EVENT_TOPIC_ID: str
     PUBSUB_MEAL_RECIPE_EVENT_TOPIC_ID: str
+    # Subscription to meal plan creation events; when unset, pending meal plans are polled from Datastore instead
+    PUBSUB_MEAL_PLAN_COMPLETION_SUBSCRIPTION_ID: str | None = None
+    PUBSUB_BATCH_MAX_MESSAGES: int = 100
+    PUBSUB_BATCH_MAX_BYTES: int = 1_000_000
+    PUBSUB_BATCH_MAX_LATENCY: float = 0.01
+    PUBSUB_MAX_PENDING_PUBLISHES: int = 1000
+    # Per-topic overrides of the options above, keyed by topic id (e.g. {"meal-plan": {"max_latency": 0.05}})
+    PUBSUB_TOPIC_OPTIONS: dict[str, dict[str, float]] = {}
+    PUBSUB_PUBLISH_TIMEOUT: float = 10
+    PUBSUB_ENABLE_MESSAGE_ORDERING: bool = True
+    PUBSUB_VALIDATE_TOPICS_ON_STARTUP: bool = True
+
+    # Datastore
+    DATASTORE_MAX_WORKERS: int = 16
+    PAGINATION_MAX_LIMIT: int = 100
+
+    # Entity cache
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_LOCAL_TTL: int = 300
+    ENTITY_CACHE_SHARED_TTL: int = 86400
+    ENTITY_CACHE_REDIS_URL: str | None = None
+
+    # User profiles
+    USER_PROFILE_CACHE_SIZE: int = 10000
+    USER_PROFILE_CACHE_TTL: int = 300
+
+    # Response compression (brotli is used when the optional `brotli` package is installed)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Shopping list and favorite writes of a user that arrive while one is in flight are merged into the next
+    # put_multi of at most WRITE_COALESCING_MAX_BATCH_SIZE entities (the Datastore limit is 500)
+    WRITE_COALESCING_MAX_BATCH_SIZE: int = 500
+    WRITE_COALESCING_RETRIES: int = 2
+    WRITE_COALESCING_RETRY_DELAY: float = 0.1
+
+    # Conditional GETs
+    ETAG_STAMP_CACHE_SIZE: int = 10000
+    ETAG_STAMP_TTL: int = 60
+
+    # Meal plans
+    MEAL_PLAN_CREATION_TIMEOUT: float = 30
+    MEAL_PLAN_COMPLETION_POLL_INTERVAL: float = 1
+    MEAL_PLAN_PREVIEW_CACHE_SIZE: int = 1000
+    MEAL_PLAN_PREVIEW_CACHE_TTL: int = 86400
+    MEAL_PLAN_PREVIEW_POOL_SIZE: int = 5
+    MEAL_PLAN_PREVIEW_POOL_MIN_REQUESTS: int = 10
+    MEAL_PLAN_PREVIEW_STREAM_HEARTBEAT_INTERVAL: float = 5
+
+    # Asynchronous jobs
+    JOB_TTL: int = 3600
+    JOB_STATUS_REFRESH_INTERVAL: float = 2
 
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_GPT_MODEL_VERSION: str
+    OPENAI_MAX_CONNECTIONS: int = 20
+    OPENAI_PREVIEW_MAX_CONCURRENCY: int = 8
+    OPENAI_PREVIEW_MAX_QUEUE_SIZE: int = 32
+    OPENAI_PREVIEW_TIMEOUT: float = 60
 
     # Mailgun
     MAILGUN_API_KEY: str | None = None
@@ -29,3 +29,23 @@ class NotFoundException(HTTPException):
 class ConflictException(HTTPException):
     def __init__(self, message: str) -> None:
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=message)
+
+
+class TooManyRequestsException(HTTPException):
+    def __init__(self, message: str) -> None:
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=message)
+
+
+class ServiceUnavailableException(HTTPException):
+    def __init__(self, message: str) -> None:
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=message)
+
+
+class GatewayTimeoutException(HTTPException):
+    def __init__(self, message: str) -> None:
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=message)
+
+
+class BadRequestException(HTTPException):
+    def __init__(self, message: str) -> None:
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
@@ -0,0 +1,51 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from google.cloud import ndb
+
+from core.clients import ndb_client
+from core.config import get_settings
+
+settings = get_settings()
+
+
+def _run_in_ndb_context(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    with ndb_client.context():
+        result = func(*args, **kwargs)
+        if isinstance(result, ndb.Future):
+            return result.result()
+
+        return result
+
+
+class DatastoreExecutor:
+    """
+    Runs blocking google-cloud-ndb calls on a bounded thread pool instead of the event loop.
+    Each call gets its own `ndb_client.context()` on the worker thread. Callables returning ndb futures
+    (tasklets and the `*_async` APIs) are resolved on the worker thread too, so they can be awaited directly.
+    """
+
+    executor: ThreadPoolExecutor | None = None
+
+    def start(self) -> None:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.DATASTORE_MAX_WORKERS,
+                thread_name_prefix="ndb-worker",
+            )
+
+    async def stop(self) -> None:
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            # In-flight calls are drained off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(_run_in_ndb_context, func, *args, **kwargs))
+
+
+datastore = DatastoreExecutor()
@@ -1,60 +1,97 @@
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Callable
 
 from auth0 import authentication, management
 from auth0.asyncify import asyncify
 
 from core.clients import ndb_client
+from core.concurrency import SingleFlight
 from core.config import get_settings, Settings
 from core.http_client import http_client
 
 settings: Settings = get_settings()
 
+AsyncGetToken = asyncify(authentication.GetToken)
+AsyncUsers = asyncify(authentication.Users)
 
-def get_auth0_token_client(management_client: bool = False) -> authentication.GetToken:
+
+class Auth0ClientManager:
     """
-    Return instance of GetToken.
+    Process-wide cache of Auth0 clients.
+    Asyncified authentication clients are built once per HTTP session, and the Management API M2M token is reused
+    until `AUTH0_MANAGEMENT_API_TOKEN_LEEWAY` seconds before it expires, then refreshed under single-flight.
     """
-    get_token_class_wrapper = asyncify(authentication.GetToken)
-    get_token = get_token_class_wrapper(
-        domain=settings.AUTH0_DOMAIN,
-        client_id=settings.AUTH0_MANAGEMENT_API_CLIENT_ID
-        if management_client
-        else settings.AUTH0_APPLICATION_CLIENT_ID,
-        client_secret=settings.AUTH0_MANAGEMENT_API_CLIENT_SECRET
-        if management_client
-        else settings.AUTH0_APPLICATION_CLIENT_SECRET,
-    )
 
-    get_token.set_session(http_client())
-    return get_token
+    def __init__(self) -> None:
+        self.clients: dict[str, tuple[Any, Any]] = {}
+        self.management_client: management.Auth0 | None = None
+        self.management_client_expires_at = 0.0
+        self.single_flight = SingleFlight()
 
+    def get_or_create(self, name: str, factory: Callable[[], Any]) -> Any:
+        session = http_client()
+        cached = self.clients.get(name)
+        if cached is not None and cached[0] is session:
+            return cached[1]
 
-def get_auth0_users_client() -> authentication.Users:
+        client = factory()
+        client.set_session(session)
+        self.clients[name] = (session, client)
+        return client
+
+    async def refresh_management_client(self) -> None:
+        auth0_token = get_auth0_token_client(management_client=True)
+        response = await auth0_token.client_credentials_async(
+            audience=settings.AUTH0_MANAGEMENT_API_AUDIENCE,
+        )
+        self.management_client = management.Auth0(
+            domain=settings.AUTH0_DOMAIN,
+            token=response["access_token"],
+        )
+        self.management_client_expires_at = (
+            time.monotonic() + response.get("expires_in", 0) - settings.AUTH0_MANAGEMENT_API_TOKEN_LEEWAY
+        )
+
+    async def get_management_client(self) -> management.Auth0:
+        if self.management_client is None or time.monotonic() >= self.management_client_expires_at:
+            await self.single_flight.do("management_client", self.refresh_management_client)
+
+        return self.management_client
+
+
+auth0_clients = Auth0ClientManager()
+
+
+def get_auth0_token_client(management_client: bool = False) -> authentication.GetToken:
     """
     Return instance of GetToken.
     """
-    users_class_wrapper = asyncify(authentication.Users)
-    users = users_class_wrapper(settings.AUTH0_DOMAIN)
-    users.set_session(http_client())
-    return users
+    return auth0_clients.get_or_create(
+        "management_token" if management_client else "token",
+        lambda: AsyncGetToken(
+            domain=settings.AUTH0_DOMAIN,
+            client_id=settings.AUTH0_MANAGEMENT_API_CLIENT_ID
+            if management_client
+            else settings.AUTH0_APPLICATION_CLIENT_ID,
+            client_secret=settings.AUTH0_MANAGEMENT_API_CLIENT_SECRET
+            if management_client
+            else settings.AUTH0_APPLICATION_CLIENT_SECRET,
+        ),
+    )
 
 
-async def get_auth0_management_api_token() -> str:
-    auth0_token = get_auth0_token_client(management_client=True)
-    response = await auth0_token.client_credentials_async(
-        audience=settings.AUTH0_MANAGEMENT_API_AUDIENCE,
-    )
-    return response["access_token"]
+def get_auth0_users_client() -> authentication.Users:
+    """
+    Return instance of Users.
+    """
+    return auth0_clients.get_or_create("users", lambda: AsyncUsers(settings.AUTH0_DOMAIN))
 
 
 async def get_auth0_management_client() -> management.Auth0:
     """
     Return instance of Auth0 management API.
     """
-    return management.Auth0(
-        domain=settings.AUTH0_DOMAIN,
-        token=await get_auth0_management_api_token(),
-    )
+    return await auth0_clients.get_management_client()
 
 
 async def get_auth0_database_client() -> authentication.Database:
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Awaitable, Callable, TypeVar
+
+from core.cache import TTLCache
+from core.config import get_settings
+from core.logger import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+MISSING = object()
+
+T = TypeVar("T")
+
+
+def create_timezone_finder() -> Any:
+    # Deferred so that neither the import nor the polygon data loading happens on cold start
+    from timezonefinder import TimezoneFinder
+
+    return TimezoneFinder()
+
+
+def read_iso_indexes() -> tuple[dict[str, str], dict[str, str]]:
+    import pycountry
+
+    countries = {country.alpha_2: country.name for country in pycountry.countries}
+    subdivisions = {subdivision.code: subdivision.name for subdivision in pycountry.subdivisions}
+    return countries, subdivisions
+
+
+class GeoLookup:
+    """
+    Resolves client location headers into timezone, country and subdivision names.
+    The timezone polygons and the ISO indexes are loaded on first use (or by `warm_up`) rather than at import,
+    in the default executor so that the event loop is never blocked, and timezones are memoized per grid cell
+    of `GEO_TIMEZONE_GRID_PRECISION` decimal degrees.
+    """
+
+    def __init__(self) -> None:
+        # In-flight or finished loads, shared by all the callers. A failed load is dropped so the next caller retries
+        self.loads: dict[str, asyncio.Future] = {}
+        self.timezones = TTLCache(settings.GEO_TIMEZONE_CACHE_SIZE)
+
+    async def load(self, name: str, loader: Callable[[], T]) -> T:
+        future = self.loads.get(name)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(None, loader)
+            self.loads[name] = future
+
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if self.loads.get(name) is future:
+                del self.loads[name]
+            raise
+
+    def load_timezone_finder(self) -> Awaitable[Any]:
+        return self.load("timezone_finder", create_timezone_finder)
+
+    def load_iso_indexes(self) -> Awaitable[tuple[dict[str, str], dict[str, str]]]:
+        return self.load("iso_indexes", read_iso_indexes)
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.gather(self.load_iso_indexes(), self.load_timezone_finder())
+        except Exception:
+            logger.exception("Geo lookup warm-up failed, the data will be loaded on first use")
+
+    async def get_timezone(self, lat: float, lng: float) -> str | None:
+        cell = (
+            round(lat, settings.GEO_TIMEZONE_GRID_PRECISION),
+            round(lng, settings.GEO_TIMEZONE_GRID_PRECISION),
+        )
+        timezone = self.timezones.get(cell, MISSING)
+        if timezone is MISSING:
+            timezone_finder = await self.load_timezone_finder()
+            timezone = timezone_finder.timezone_at(lat=cell[0], lng=cell[1])
+            self.timezones.set(cell, timezone)
+
+        return timezone
+
+    async def get_country_name(self, country_iso_code: str) -> str:
+        countries, _ = await self.load_iso_indexes()
+        return countries.get(country_iso_code.upper(), country_iso_code)
+
+    async def get_subdivision_name(self, subdivision_iso_code: str) -> str:
+        _, subdivisions = await self.load_iso_indexes()
+        return subdivisions.get(subdivision_iso_code.upper(), subdivision_iso_code)
+
+
+geo_lookup = GeoLookup()
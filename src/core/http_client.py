@@ -1,3 +1,34 @@
+import aiohttp
 from mealhow_sdk.clients import HttpClient
 
+from core.config import get_settings
+
+settings = get_settings()
+
+
+class PooledHttpClient:
+    """
+    aiohttp session with its own connection pool budget, so traffic to one upstream cannot exhaust
+    the connections shared by everything else.
+    """
+
+    session: aiohttp.ClientSession | None = None
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections = max_connections
+
+    def start(self) -> None:
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections))
+
+    async def stop(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def __call__(self) -> aiohttp.ClientSession:
+        assert self.session is not None
+        return self.session
+
+
 http_client = HttpClient()
+openai_http_client = PooledHttpClient(max_connections=settings.OPENAI_MAX_CONNECTIONS)
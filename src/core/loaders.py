@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any
+
+from google.cloud import ndb
+
+from core.cache import EntityCache
+from core.datastore import datastore
+
+
+async def get_entities_from_db(keys: list[ndb.Key]) -> list[Any]:
+    return await datastore.run(ndb.get_multi, keys)
+
+
+class EntityLoader:
+    """
+    DataLoader-style batching layer over ndb.
+    Keys requested within the same event loop tick are resolved with a single `ndb.get_multi`, and every key is
+    fetched at most once for the lifetime of the loader, so create one loader per request.
+    When a cache is given, batches are read through it.
+    """
+
+    def __init__(self, cache: EntityCache | None = None) -> None:
+        self.cache = cache
+        self.futures: dict[ndb.Key, asyncio.Future] = {}
+        self.batch: list[ndb.Key] = []
+        self.tasks: set[asyncio.Task] = set()
+
+    async def fetch(self, keys: list[ndb.Key]) -> None:
+        try:
+            if self.cache is not None:
+                entities = await self.cache.get_multi(keys, get_entities_from_db)
+            else:
+                entities = await get_entities_from_db(keys)
+        except Exception as e:
+            for key in keys:
+                self.futures.pop(key).set_exception(e)
+            return
+
+        for key, entity in zip(keys, entities):
+            self.futures[key].set_result(entity)
+
+    def dispatch(self) -> None:
+        keys, self.batch = self.batch, []
+        task = asyncio.create_task(self.fetch(keys))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def load_many(self, keys: list[ndb.Key]) -> list[Any]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for key in keys:
+            if key not in self.futures:
+                if not self.batch:
+                    loop.call_soon(self.dispatch)
+
+                self.futures[key] = loop.create_future()
+                self.batch.append(key)
+
+            futures.append(self.futures[key])
+
+        return list(await asyncio.gather(*futures))
+
+    async def load(self, key: ndb.Key) -> Any:
+        return (await self.load_many([key]))[0]
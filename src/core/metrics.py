@@ -0,0 +1,34 @@
+import contextlib
+import time
+from collections import defaultdict
+from typing import Iterator
+
+
+class Metrics:
+    """
+    Process-wide counters exported through the `/metrics` endpoint.
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        self.counters[f"{name}.count"] += 1
+        self.counters[f"{name}.sum"] += value
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at)
+
+    def snapshot(self) -> dict[str, float]:
+        return dict(sorted(self.counters.items()))
+
+
+metrics = Metrics()
@@ -0,0 +1,233 @@
+import zlib
+from typing import Any, Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.auth import get_bearer_token, JWKSKeyStore, verify_jwt_token
+from core.custom_exceptions import (
+    BadCredentialsException,
+    RequiresAuthenticationException,
+    UnableCredentialsException,
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip is always available
+    brotli = None
+
+
+class PathMatcher:
+    """
+    Matches a path against a frozen set of exact paths and a tuple of prefixes.
+    """
+
+    def __init__(self, paths: Iterable[str], prefixes: Iterable[str] = ()) -> None:
+        self.paths = frozenset(paths)
+        self.prefixes = tuple(prefixes)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths or path.startswith(self.prefixes)
+
+
+class SecurityMiddleware:
+    """
+    Pure ASGI replacement for the authorization and secure headers `BaseHTTPMiddleware`s.
+    Verifies the bearer token outside of `public_paths` and adds the precomputed `secure_headers` to every
+    response outside of `unsecured_paths`; `overridable_headers` among them are only defaults that routes may set
+    themselves (e.g. their own Cache-Control). Response bodies are passed through untouched, so streaming
+    responses are not buffered.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        key_store: JWKSKeyStore,
+        secure_headers: Iterable[tuple[str, str]],
+        public_paths: PathMatcher,
+        unsecured_paths: PathMatcher,
+        overridable_headers: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.key_store = key_store
+        self.secure_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in secure_headers
+        ]
+        overridable_header_names = {name.lower().encode("latin-1") for name in overridable_headers}
+        self.enforced_header_names = frozenset(
+            name for name, _ in self.secure_headers if name not in overridable_header_names
+        )
+        self.public_paths = public_paths
+        self.unsecured_paths = unsecured_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path not in self.unsecured_paths:
+            send = self.with_secure_headers(send)
+
+        if path not in self.public_paths:
+            try:
+                jwt_access_token = get_bearer_token(Request(scope))
+                payload = await verify_jwt_token(jwt_access_token, self.key_store)
+            except (BadCredentialsException, RequiresAuthenticationException, UnableCredentialsException) as e:
+                response = JSONResponse({"message": str(e.detail)}, status_code=e.status_code)
+                await response(scope, receive, send)
+                return
+
+            state = scope.setdefault("state", {})
+            state["access_token"] = jwt_access_token
+            state["user_id"] = payload["sub"]
+
+        await self.app(scope, receive, send)
+
+    def with_secure_headers(self, send: Send) -> Send:
+        async def send_with_secure_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                route_headers = message.get("headers", [])
+                route_header_names = {name for name, _ in route_headers}
+                headers: list[Any] = [
+                    (name, value) for name, value in route_headers if name not in self.enforced_header_names
+                ]
+                headers.extend(
+                    (name, value)
+                    for name, value in self.secure_headers
+                    if name in self.enforced_header_names or name not in route_header_names
+                )
+                message["headers"] = headers
+
+            await send(message)
+
+        return send_with_secure_headers
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI response compression negotiated from Accept-Encoding: brotli when the optional `brotli` package is
+    installed, gzip otherwise. Complete bodies under `minimum_size` are sent as is. Streamed bodies are compressed
+    chunk by chunk and flushed after each one, so events are not held back; `excluded_media_types` (e.g. SSE)
+    are never compressed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        gzip_level: int,
+        brotli_quality: int,
+        excluded_media_types: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_media_types = tuple(excluded_media_types)
+
+    def get_encoding(self, accept_encoding: str) -> str | None:
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.partition(";")
+            try:
+                quality = float(params.strip().removeprefix("q=")) if params.strip() else 1.0
+            except ValueError:
+                quality = 0.0
+
+            if quality > 0:
+                accepted.add(coding.strip())
+
+        if brotli is not None and accepted & {"br", "*"}:
+            return "br"
+
+        if accepted & {"gzip", "*"}:
+            return "gzip"
+
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.get_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, CompressionResponder(self, encoding, send))
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message | None = None
+        self.compressor: Any = None
+        self.passthrough = False
+
+    def create_compressor(self) -> Any:
+        if self.encoding == "br":
+            return brotli.Compressor(quality=self.middleware.brotli_quality)
+
+        return zlib.compressobj(self.middleware.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(body) + (self.compressor.flush() if more_body else self.compressor.finish())
+
+        return self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message.setdefault("headers", []))
+            self.passthrough = (
+                "content-encoding" in headers
+                or headers.get("content-type", "").startswith(self.middleware.excluded_media_types)
+                or message["status"] in (204, 304)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is None:
+            await self.send(
+                {"type": "http.response.body", "body": self.compress(body, more_body), "more_body": more_body}
+            )
+            return
+
+        start_message, self.start_message = self.start_message, None
+        headers = MutableHeaders(raw=start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body and len(body) < self.middleware.minimum_size:
+            self.passthrough = True
+            await self.send(start_message)
+            await self.send(message)
+            return
+
+        self.compressor = self.create_compressor()
+        body = self.compress(body, more_body)
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed representation is not byte-identical to the one the strong ETag was computed for
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+
+        await self.send(start_message)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,192 @@
+import abc
+import asyncio
+import datetime
+import json
+from collections import defaultdict
+from typing import Any, Awaitable, Callable
+
+from google.cloud import pubsub_v1
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CompletionNotifier:
+    """
+    In-process registry of coroutines waiting for a background job to produce a result.
+    Waiters are keyed by an arbitrary string (e.g. user id) and are woken by whatever listener feeds the notifier.
+    """
+
+    def __init__(self) -> None:
+        self.waiters: dict[str, set[asyncio.Future]] = defaultdict(set)
+        self.has_waiters = asyncio.Event()
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def register(self, key: str) -> asyncio.Future:
+        """
+        Register a waiter before triggering the job, so a completion that arrives early is not missed.
+        """
+        self.loop = asyncio.get_running_loop()
+        waiter = self.loop.create_future()
+        self.waiters[key].add(waiter)
+        self.has_waiters.set()
+        return waiter
+
+    def unregister(self, key: str, waiter: asyncio.Future) -> None:
+        waiters = self.waiters.get(key)
+        if waiters is None:
+            return
+
+        waiters.discard(waiter)
+        if not waiters:
+            del self.waiters[key]
+
+        if not self.waiters:
+            self.has_waiters.clear()
+
+    async def wait(self, key: str, waiter: asyncio.Future, timeout: float) -> Any:
+        """
+        Wait for a registered waiter to be resolved. Raises `asyncio.TimeoutError` if nothing arrives in time.
+        """
+        try:
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        finally:
+            self.unregister(key, waiter)
+
+    def has_waiters_for(self, key: str) -> bool:
+        return key in self.waiters
+
+    def pending_keys(self) -> list[str]:
+        return list(self.waiters.keys())
+
+    def notify(self, key: str, value: Any) -> None:
+        for waiter in self.waiters.get(key, ()):
+            if not waiter.done():
+                waiter.set_result(value)
+
+    def notify_threadsafe(self, key: str, value: Any) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.notify, key, value)
+
+
+class CompletionListener(abc.ABC):
+    """
+    Feeds completion events into a `CompletionNotifier`.
+    """
+
+    def __init__(self, notifier: CompletionNotifier) -> None:
+        self.notifier = notifier
+
+    @abc.abstractmethod
+    async def start(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def stop(self) -> None:
+        ...
+
+
+class PubSubCompletionListener(CompletionListener):
+    """
+    Wakes waiters from a single Pub/Sub subscription shared by every waiter in the process.
+    Messages are expected to carry a JSON body with `key_field` and `value_field` entries.
+    The subscription may be shared with other instances, so an event nobody waits for here is nacked for
+    redelivery to the instance holding the waiter, until it is older than `max_age` (the longest wait).
+    """
+
+    def __init__(
+        self,
+        notifier: CompletionNotifier,
+        subscription_path: str,
+        key_field: str,
+        value_field: str,
+        max_age: float,
+    ) -> None:
+        super().__init__(notifier)
+        self.subscription_path = subscription_path
+        self.key_field = key_field
+        self.value_field = value_field
+        self.max_age = max_age
+        self.subscriber: pubsub_v1.SubscriberClient | None = None
+        self.streaming_pull_future: Any = None
+
+    def is_expired(self, message: Any) -> bool:
+        age = datetime.datetime.now(datetime.timezone.utc) - message.publish_time
+        return age.total_seconds() > self.max_age
+
+    def callback(self, message: Any) -> None:
+        try:
+            body = json.loads(message.data)
+            key, value = str(body[self.key_field]), body[self.value_field]
+        except (ValueError, KeyError):
+            logger.warning("Skipping malformed completion event %s", message.message_id)
+            message.ack()
+            return
+
+        if self.notifier.has_waiters_for(key):
+            self.notifier.notify_threadsafe(key, value)
+            message.ack()
+        elif self.is_expired(message):
+            message.ack()
+        else:
+            message.nack()
+
+    async def start(self) -> None:
+        self.notifier.loop = asyncio.get_running_loop()
+        self.subscriber = pubsub_v1.SubscriberClient()
+        self.streaming_pull_future = self.subscriber.subscribe(self.subscription_path, callback=self.callback)
+
+    async def stop(self) -> None:
+        if self.streaming_pull_future is not None:
+            self.streaming_pull_future.cancel()
+            self.streaming_pull_future = None
+
+        if self.subscriber is not None:
+            self.subscriber.close()
+            self.subscriber = None
+
+
+class PollingCompletionListener(CompletionListener):
+    """
+    Local stand-in for the Pub/Sub listener. A single background task resolves all pending keys with one
+    batched lookup per interval, and stays idle while nobody is waiting.
+    """
+
+    def __init__(
+        self,
+        notifier: CompletionNotifier,
+        poll: Callable[[list[str]], Awaitable[dict[str, Any]]],
+        interval: float,
+    ) -> None:
+        super().__init__(notifier)
+        self.poll = poll
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        while True:
+            await self.notifier.has_waiters.wait()
+            await asyncio.sleep(self.interval)
+
+            keys = self.notifier.pending_keys()
+            if not keys:
+                continue
+
+            try:
+                results = await self.poll(keys)
+            except Exception:
+                logger.exception("Completion poll failed")
+                continue
+
+            for key, value in results.items():
+                self.notifier.notify(key, value)
+
+    async def start(self) -> None:
+        self.notifier.loop = asyncio.get_running_loop()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
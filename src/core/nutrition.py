@@ -0,0 +1,141 @@
+"""
+Synchronous nutrition engine. Computes what `mealhow_sdk.helpers` computes (BMR, calorie goals, unit conversions and
+BMI) without awaiting a coroutine per arithmetic step, and offers a NumPy batch API for bulk recomputes.
+
+The activity level and goal adjustments are product-defined and stay owned by the SDK: `load_adjustments` samples
+the SDK helpers once at startup into `factor * calories + offset` tables, and refuses adjustments that are not of
+that form. The BMR formulas are the published Harris-Benedict and Mifflin-St Jeor equations; tests/test_nutrition.py
+keeps all of them in parity with the SDK helpers.
+"""
+from typing import Any, Awaitable, Callable, Iterable
+
+import numpy as np
+from mealhow_sdk import enums, helpers
+
+from schemas.user import BiologicalSex
+
+KG_PER_LB = 0.45359237
+CM_PER_INCH = 2.54
+
+# Revised Harris-Benedict and Mifflin-St Jeor coefficients: (constant, weight kg, height cm, age years)
+HARRIS_BENEDICT_COEFFICIENTS = {
+    BiologicalSex.male.value: (88.362, 13.397, 4.799, -5.677),
+    BiologicalSex.female.value: (447.593, 9.247, 3.098, -4.330),
+}
+MIFFLIN_ST_JEOR_COEFFICIENTS = {
+    BiologicalSex.male.value: (5.0, 10.0, 6.25, -5.0),
+    BiologicalSex.female.value: (-161.0, 10.0, 6.25, -5.0),
+}
+
+# Calorie inputs the SDK adjustments are sampled at; large enough for the SDK's rounding not to matter. The third
+# one only checks that the adjustment is linear
+SAMPLE_CALORIES = (100_000, 200_000, 300_000)
+
+# `value -> (factor, offset)` tables filled by `load_adjustments`
+ACTIVITY_LEVEL_ADJUSTMENTS: dict[str, tuple[float, float]] = {}
+GOAL_ADJUSTMENTS: dict[str, tuple[float, float]] = {}
+
+
+async def get_adjustment_table(
+    helper: Callable[[int, Any], Awaitable[float]], members: Iterable[Any]
+) -> dict[str, tuple[float, float]]:
+    table = {}
+    for member in members:
+        low, high, check = [await helper(calories, member) for calories in SAMPLE_CALORIES]
+        factor = (high - low) / (SAMPLE_CALORIES[1] - SAMPLE_CALORIES[0])
+        offset = low - factor * SAMPLE_CALORIES[0]
+        if abs(factor * SAMPLE_CALORIES[2] + offset - check) > 1:
+            raise ValueError(f"{helper.__name__} is not a linear adjustment for {member.value}")
+
+        table[member.value] = (factor, offset)
+
+    return table
+
+
+async def load_adjustments() -> None:
+    ACTIVITY_LEVEL_ADJUSTMENTS.update(
+        await get_adjustment_table(helpers.get_calories_goal_by_activity_level, enums.ActivityLevel)
+    )
+    GOAL_ADJUSTMENTS.update(await get_adjustment_table(helpers.get_calories_goal_by_goal_type, enums.Goal))
+
+
+def get_adjustment(table: dict[str, tuple[float, float]], member: Any) -> tuple[float, float]:
+    if not table:
+        raise RuntimeError("Nutrition adjustments are not loaded, await load_adjustments() first")
+
+    return table[getattr(member, "value", member)]
+
+
+def convert_height_to_imperial(height_cm: float) -> int:
+    return int(round(height_cm / CM_PER_INCH))
+
+
+def convert_height_to_metric(height_inches: float) -> int:
+    return int(round(height_inches * CM_PER_INCH))
+
+
+def convert_weight_to_imperial(weight_kg: float) -> int:
+    return int(round(weight_kg / KG_PER_LB))
+
+
+def convert_weight_to_metric(weight_lbs: float) -> int:
+    return int(round(weight_lbs * KG_PER_LB))
+
+
+def get_bmi(weight_kg: float, height_cm: float) -> float:
+    return round(weight_kg / (height_cm / 100) ** 2, 1)
+
+
+def get_basal_metabolic_rate(coefficients: tuple[float, ...], weight_kg: float, height_cm: float, age: int) -> float:
+    constant, weight_factor, height_factor, age_factor = coefficients
+    return constant + weight_factor * weight_kg + height_factor * height_cm + age_factor * age
+
+
+def get_bmr(weight_kg: float, height_cm: float, age: int, sex: Any) -> int:
+    """
+    Average of the Harris-Benedict and Mifflin-St Jeor estimates.
+    """
+    sex = getattr(sex, "value", sex)
+    bmr_hb = get_basal_metabolic_rate(HARRIS_BENEDICT_COEFFICIENTS[sex], weight_kg, height_cm, age)
+    bmr_msj = get_basal_metabolic_rate(MIFFLIN_ST_JEOR_COEFFICIENTS[sex], weight_kg, height_cm, age)
+    return int(round((bmr_hb + bmr_msj) / 2))
+
+
+def get_calories_goal(bmr: float, activity_level: Any, goal: Any) -> int:
+    activity_factor, activity_offset = get_adjustment(ACTIVITY_LEVEL_ADJUSTMENTS, activity_level)
+    goal_factor, goal_offset = get_adjustment(GOAL_ADJUSTMENTS, goal)
+    calories_goal = (bmr * activity_factor + activity_offset) * goal_factor + goal_offset
+    return int(round(calories_goal / 100) * 100)
+
+
+def get_bmr_and_calories_goal_batch(
+    weight_kg: Iterable[float],
+    height_cm: Iterable[float],
+    age: Iterable[int],
+    sex: Iterable[Any],
+    activity_level: Iterable[Any],
+    goal: Iterable[Any],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized `get_bmr` + `get_calories_goal` over whole columns of profiles, for backfills and bulk recomputes.
+    Returns integer arrays of BMRs and calories goals in input order.
+    """
+    weights = np.asarray(weight_kg, dtype=np.float64)
+    heights = np.asarray(height_cm, dtype=np.float64)
+    ages = np.asarray(age, dtype=np.float64)
+    sexes = [getattr(s, "value", s) for s in sex]
+
+    bmr_sum = np.zeros_like(weights)
+    for coefficients_by_sex in (HARRIS_BENEDICT_COEFFICIENTS, MIFFLIN_ST_JEOR_COEFFICIENTS):
+        coefficients = np.array([coefficients_by_sex[s] for s in sexes], dtype=np.float64).reshape(-1, 4)
+        bmr_sum += coefficients[:, 0] + coefficients[:, 1] * weights + coefficients[:, 2] * heights
+        bmr_sum += coefficients[:, 3] * ages
+
+    bmr = np.round(bmr_sum / 2)
+    activity = np.array(
+        [get_adjustment(ACTIVITY_LEVEL_ADJUSTMENTS, a) for a in activity_level], dtype=np.float64
+    ).reshape(-1, 2)
+    goals = np.array([get_adjustment(GOAL_ADJUSTMENTS, g) for g in goal], dtype=np.float64).reshape(-1, 2)
+    calories_goal = (bmr * activity[:, 0] + activity[:, 1]) * goals[:, 0] + goals[:, 1]
+
+    return bmr.astype(np.int64), (np.round(calories_goal / 100) * 100).astype(np.int64)
@@ -0,0 +1,34 @@
+from typing import Any
+
+from fastapi import Response
+from google.api_core import exceptions as api_exceptions
+from google.cloud import ndb
+
+from core import custom_exceptions
+from core.datastore import datastore
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+async def fetch_page(
+    query: ndb.Query, limit: int | None, cursor: str | None = None, **options: Any
+) -> tuple[list[Any], str | None]:
+    """
+    Fetch one page of query results. Returns the entities and the urlsafe cursor of the next page, if there is one.
+    Without a `limit`, every remaining result is returned, as the list endpoints did before they were paginated.
+    """
+    try:
+        start_cursor = ndb.Cursor(urlsafe=cursor) if cursor else None
+        if limit is None:
+            return await datastore.run(query.fetch, start_cursor=start_cursor, **options), None
+
+        results, next_cursor, more = await datastore.run(query.fetch_page, limit, start_cursor=start_cursor, **options)
+    except (ValueError, api_exceptions.BadRequest):
+        raise custom_exceptions.BadRequestException("Invalid cursor")
+
+    return results, next_cursor.urlsafe().decode("utf-8") if more and next_cursor else None
+
+
+def set_next_cursor_header(response: Response, next_cursor: str | None) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,142 @@
+import asyncio
+import functools
+import time
+from typing import Any, Callable
+
+from google.api_core.exceptions import NotFound, PermissionDenied
+from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1 import types
+
+from core.config import get_settings
+from core.custom_exceptions import ServiceUnavailableException
+from core.logger import get_logger
+from core.metrics import metrics
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+def get_topic_options(topic_id: str) -> dict[str, Any]:
+    return {
+        "max_messages": settings.PUBSUB_BATCH_MAX_MESSAGES,
+        "max_bytes": settings.PUBSUB_BATCH_MAX_BYTES,
+        "max_latency": settings.PUBSUB_BATCH_MAX_LATENCY,
+        "max_pending": settings.PUBSUB_MAX_PENDING_PUBLISHES,
+        **settings.PUBSUB_TOPIC_OPTIONS.get(topic_id, {}),
+    }
+
+
+def create_publisher_client(options: dict[str, Any]) -> pubsub_v1.PublisherClient:
+    """
+    Honours `PUBSUB_EMULATOR_HOST`, so the same client runs against a local Pub/Sub emulator.
+    """
+    return pubsub_v1.PublisherClient(
+        batch_settings=types.BatchSettings(
+            max_messages=options["max_messages"],
+            max_bytes=options["max_bytes"],
+            max_latency=options["max_latency"],
+        ),
+        publisher_options=types.PublisherOptions(
+            enable_message_ordering=settings.PUBSUB_ENABLE_MESSAGE_ORDERING,
+            flow_control=types.PublishFlowControl(
+                message_limit=options["max_pending"],
+                limit_exceeded_behavior=types.LimitExceededBehavior.ERROR,
+            ),
+        ),
+    )
+
+
+class TopicPublisher:
+    """
+    Publishes to a single topic through its own batching client. At most `max_pending` publishes are in flight;
+    further callers wait on the event loop instead of blocking it inside the client's flow control.
+    """
+
+    def __init__(self, topic: str, client: Any, max_pending: int) -> None:
+        self.topic = topic
+        self.name = topic.rsplit("/", 1)[-1]
+        self.client = client
+        self.pending = asyncio.Semaphore(max_pending)
+
+    async def publish(self, data: bytes, ordering_key: str = "") -> str:
+        if not settings.PUBSUB_ENABLE_MESSAGE_ORDERING:
+            ordering_key = ""
+
+        async with self.pending:
+            started_at = time.perf_counter()
+            try:
+                future = self.client.publish(self.topic, data, ordering_key=ordering_key)
+                message_id = await asyncio.wait_for(asyncio.wrap_future(future), settings.PUBSUB_PUBLISH_TIMEOUT)
+            except Exception:
+                metrics.increment(f"pubsub.{self.name}.failure")
+                if ordering_key:
+                    # A failed publish pauses its ordering key until it is explicitly resumed
+                    self.client.resume_publish(self.topic, ordering_key)
+
+                logger.exception("Failed to publish to %s", self.name)
+                raise ServiceUnavailableException("Failed to publish event")
+
+            metrics.observe(f"pubsub.{self.name}.latency", time.perf_counter() - started_at)
+            return message_id
+
+
+class EventPublisher:
+    """
+    Process-wide entry point for Pub/Sub events, addressed by topic id. Batch settings and flow control are taken
+    from the `PUBSUB_*` settings, with per-topic overrides in `PUBSUB_TOPIC_OPTIONS`.
+    """
+
+    def __init__(self, client_factory: Callable[[dict[str, Any]], Any] = create_publisher_client) -> None:
+        self.client_factory = client_factory
+        self.topics: dict[str, TopicPublisher] = {}
+
+    def get_topic_publisher(self, topic_id: str) -> TopicPublisher:
+        publisher = self.topics.get(topic_id)
+        if publisher is None:
+            options = get_topic_options(topic_id)
+            client = self.client_factory(options)
+            publisher = TopicPublisher(client.topic_path(settings.PROJECT_ID, topic_id), client, options["max_pending"])
+            self.topics[topic_id] = publisher
+
+        return publisher
+
+    async def register_topics(self, topic_ids: list[str]) -> None:
+        """
+        Resolves and pins the publishers of `topic_ids` at startup. With `PUBSUB_VALIDATE_TOPICS_ON_STARTUP`,
+        a missing topic fails the boot instead of the first request that publishes to it. The validation needs
+        the `pubsub.topics.get` permission on top of `pubsub.topics.publish`.
+        """
+        loop = asyncio.get_running_loop()
+        for topic_id in topic_ids:
+            publisher = self.get_topic_publisher(topic_id)
+            if not settings.PUBSUB_VALIDATE_TOPICS_ON_STARTUP:
+                continue
+
+            try:
+                await loop.run_in_executor(None, functools.partial(publisher.client.get_topic, topic=publisher.topic))
+            except NotFound:
+                raise RuntimeError(f"Pub/Sub topic {publisher.topic} does not exist")
+            except PermissionDenied:
+                raise RuntimeError(
+                    f"Validating Pub/Sub topic {publisher.topic} requires the pubsub.topics.get permission "
+                    "(e.g. roles/pubsub.viewer), which roles/pubsub.publisher does not grant. "
+                    "Grant it or set PUBSUB_VALIDATE_TOPICS_ON_STARTUP=false"
+                )
+
+    async def publish(self, topic_id: str, data: bytes, ordering_key: str = "") -> str:
+        """
+        Publishes `data` and waits for the server acknowledgement without blocking the event loop.
+        Messages sharing an `ordering_key` are delivered in publish order.
+        """
+        return await self.get_topic_publisher(topic_id).publish(data, ordering_key)
+
+    async def stop(self) -> None:
+        loop = asyncio.get_running_loop()
+        for publisher in self.topics.values():
+            # Flushes the outstanding batches
+            await loop.run_in_executor(None, publisher.client.stop)
+
+        self.topics.clear()
+
+
+event_publisher = EventPublisher()
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from google.cloud import ndb
+
+from core.datastore import datastore
+from core.logger import get_logger
+from core.metrics import metrics
+
+logger = get_logger(__name__)
+
+
+async def put_entities(entities: list[Any]) -> None:
+    await datastore.run(ndb.put_multi, entities)
+
+
+class PendingBatch:
+    """
+    Entities waiting for the next write of a user, keyed by entity, and the future their callers wait on.
+    """
+
+    def __init__(self) -> None:
+        self.entities: dict[Hashable, Any] = {}
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class WriteCoalescer:
+    """
+    Coalesces the Datastore writes of a user. A `put` returns once its entities are written, so nothing is
+    acknowledged before it is persisted. At most one write per user is in flight; entities put meanwhile are merged
+    into the next `put_multi` (the latest state of an entity wins), so rapid successive mutations cost one write
+    instead of one each and an older state never lands after a newer one.
+    Callers must not mutate the entities they put until `put` returns.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_batch_size: int,
+        retries: int,
+        retry_delay: float,
+        write: Callable[[list[Any]], Awaitable[Any]] = put_entities,
+    ) -> None:
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.write = write
+        self.pending: dict[str, PendingBatch] = {}
+        self.writers: dict[str, asyncio.Task] = {}
+
+    async def put(self, user_id: str, entities: dict[Hashable, Any]) -> None:
+        if not entities:
+            return
+
+        batch = self.pending.get(user_id)
+        if batch is None:
+            batch = self.pending[user_id] = PendingBatch()
+        elif batch.entities.keys() & entities.keys():
+            metrics.increment(f"write_coalescing.{self.name}.merged")
+
+        batch.entities.update(entities)
+        if user_id not in self.writers:
+            self.writers[user_id] = asyncio.create_task(self.write_pending(user_id))
+
+        # Shielded, so a cancelled caller does not cancel the write for everyone else in the batch
+        await asyncio.shield(batch.future)
+
+    async def write_pending(self, user_id: str) -> None:
+        try:
+            while batch := self.pending.pop(user_id, None):
+                try:
+                    await self.write_batch(list(batch.entities.values()))
+                except Exception as e:
+                    batch.future.set_exception(e)
+                else:
+                    batch.future.set_result(None)
+        finally:
+            del self.writers[user_id]
+
+    async def write_batch(self, entities: list[Any]) -> None:
+        for i in range(0, len(entities), self.max_batch_size):
+            for attempt in range(self.retries + 1):
+                try:
+                    with metrics.timer(f"write_coalescing.{self.name}.write"):
+                        await self.write(entities[i : i + self.max_batch_size])
+                    break
+                except Exception:
+                    metrics.increment(f"write_coalescing.{self.name}.failure")
+                    if attempt == self.retries:
+                        raise
+
+                    logger.warning("Write of %s failed, retrying", self.name, exc_info=True)
+                    await asyncio.sleep(self.retry_delay * 2**attempt)
+
+    async def stop(self) -> None:
+        """
+        Waits for the writes still in flight, including the batches merged behind them.
+        """
+        while self.writers:
+            await asyncio.gather(*self.writers.values(), return_exceptions=True)
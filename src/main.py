@@ -1,34 +1,41 @@
-from typing import Any, Callable, Literal
+import asyncio
+from typing import Any, Literal
 
-import jwt
 import openai
 import secure
 from async_stripe import stripe
 from elasticapm.contrib.starlette import ElasticAPM, make_apm_client
-from fastapi import FastAPI, Request, Response, status
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from core.auth import get_bearer_token, verify_jwt_token
-from core.clients import cloud_storage_session, ndb_client, pubsub_publisher
+from core import nutrition
+from core.auth import JWKSKeyStore
+from core.clients import cloud_storage_session
 from core.config import get_settings, Settings
-from core.custom_exceptions import (
-    BadCredentialsException,
-    RequiresAuthenticationException,
-    UnableCredentialsException,
-)
+from core.datastore import datastore
+from core.geo import geo_lookup
 from core.helpers import custom_generate_unique_id
-from core.http_client import http_client
+from core.http_client import http_client, openai_http_client
 from core.logger import get_logger
-from routes import auth, meal, meal_plan, shopping_list, subscription, user
+from core.metrics import metrics
+from core.middleware import CompressionMiddleware, PathMatcher, SecurityMiddleware
+from core.pagination import NEXT_CURSOR_HEADER
+from core.pubsub import event_publisher
+from routes import auth, job, meal, meal_plan, shopping_list, subscription, user
+from services.meal import favorite_meals_writer, meal_entity_cache
+from services.meal_plan import get_meal_plan_completion_listener
+from services.shopping_list import shopping_lists_writer
 
 settings: Settings = get_settings()
 logger = get_logger(__name__)
 
 stripe.api_key = settings.STRIPE_API_KEY
 
-jwks_client = jwt.PyJWKClient(f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json")
+meal_plan_completion_listener = get_meal_plan_completion_listener()
+
+jwks_key_store = JWKSKeyStore(f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json")
 app = FastAPI(
     root_path=settings.root_path,
     generate_unique_id_function=custom_generate_unique_id,
@@ -71,25 +78,64 @@ app.add_middleware(
     allow_origins=settings.CLIENT_ORIGIN_URLS.split(","),
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
     max_age=86400,
 )
 
-# Elastic APM instrumentation needs to be added after all the BaseHTTPMiddlewares to mitigate the mutated
-# context objects in Starlette
+# Elastic APM instrumentation is added before the security middleware, which therefore runs outside of it
 # Caveat: APM instrumentation will lose the span data of the upward middlewares in the stack
 app.add_middleware(ElasticAPM, client=apm)
 
+app.add_middleware(
+    SecurityMiddleware,
+    key_store=jwks_key_store,
+    secure_headers=secure_headers.headers_tuple(),
+    public_paths=PathMatcher(settings.WHITELISTED_PATHS, prefixes=[f"{settings.API_V1_PREFIX}/auth"]),
+    unsecured_paths=PathMatcher(settings.WHITELISTED_PATHS),
+    overridable_headers=["Cache-Control"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    excluded_media_types=["text/event-stream"],
+)
+
 
 @app.on_event("startup")
 async def startup() -> None:
+    await nutrition.load_adjustments()
     http_client.start()
-    openai.aiosession.set(http_client())
+    openai_http_client.start()
+    datastore.start()
+    openai.aiosession.set(openai_http_client())
     cloud_storage_session.initialise(http_client())
+    await jwks_key_store.warm_up()
+    await event_publisher.register_topics(
+        [
+            settings.PUBSUB_MEAL_PLAN_EVENT_TOPIC_ID,
+            settings.PUBSUB_SHOPPING_LIST_EVENT_TOPIC_ID,
+            settings.PUBSUB_MEAL_RECIPE_EVENT_TOPIC_ID,
+        ]
+    )
+    await meal_plan_completion_listener.start()
+    if settings.GEO_WARM_UP_ON_STARTUP:
+        # Kept on the app state so the warm-up task is not garbage collected before it finishes
+        app.state.geo_warm_up = asyncio.create_task(geo_lookup.warm_up())
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
+    await meal_plan_completion_listener.stop()
+    await shopping_lists_writer.stop()
+    await favorite_meals_writer.stop()
+    await event_publisher.stop()
+    await meal_entity_cache.close()
     await http_client.stop()
+    await openai_http_client.stop()
+    await datastore.stop()
 
 
 @app.exception_handler(StarletteHTTPException)
@@ -99,49 +145,16 @@ async def http_exception_handler(request: Request, exc: Any) -> JSONResponse:
     return JSONResponse({"message": message}, status_code=exc.status_code)
 
 
-@app.middleware("http")
-async def authorization_middleware(request: Request, call_next: Callable) -> Response | JSONResponse:
-    if request.url.path in settings.WHITELISTED_PATHS or request.url.path.startswith(f"{settings.API_V1_PREFIX}/auth"):
-        return await call_next(request)
-
-    try:
-        jwt_access_token = get_bearer_token(request)
-        payload = verify_jwt_token(jwt_access_token, jwks_client)
-    except (BadCredentialsException, RequiresAuthenticationException, UnableCredentialsException) as e:
-        message = str(e.detail)
-        return JSONResponse({"message": message}, status_code=e.status_code)
-
-    request.state.access_token = jwt_access_token
-    request.state.user_id = payload["sub"]
-
-    return await call_next(request)
-
-
-@app.middleware("http")
-async def set_secure_headers(request: Request, call_next: Callable) -> Response:
-    response = await call_next(request)
-
-    if request.url.path in settings.WHITELISTED_PATHS:
-        return response
-
-    secure_headers.framework.fastapi(response)
-    return response
-
-
-@app.middleware("http")
-async def client_middleware(request: Request, call_next: Callable) -> Response:
-    request.state.gcloud_storage_client = cloud_storage_session
-    request.state.ndb_client = ndb_client
-    request.state.http_client_session = http_client
-    request.state.pubsub_publisher = pubsub_publisher
-    return await call_next(request)
-
-
 @app.get("/status", status_code=status.HTTP_200_OK, operation_id="status_200")
 async def get_status() -> dict[str, Literal[True]]:
     return {"healthy": True}
 
 
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+async def get_metrics() -> dict[str, float]:
+    return metrics.snapshot()
+
+
 @app.get(
     "/error",
     status_code=status.HTTP_200_OK,
@@ -184,6 +197,11 @@ app.include_router(
     prefix=f"{settings.API_V1_PREFIX}/shopping-lists",
     tags=["Shopping Lists"],
 )
+app.include_router(
+    job.router,
+    prefix=f"{settings.API_V1_PREFIX}/jobs",
+    tags=["Jobs"],
+)
 
 
 if __name__ == "__main__":
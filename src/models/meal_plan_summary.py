@@ -0,0 +1,15 @@
+from google.cloud import ndb
+
+
+class MealPlanSummary(ndb.Model):
+    """
+    Aggregate of an archived meal plan, keyed by the meal plan id.
+    Archived plans no longer change, so the summary is written once and never updated.
+    """
+
+    user = ndb.KeyProperty(kind="User")
+    status = ndb.StringProperty()
+    start_date = ndb.DateProperty()
+    end_date = ndb.DateProperty()
+    daily_totals = ndb.JsonProperty()
+    created_at = ndb.DateTimeProperty(auto_now_add=True)
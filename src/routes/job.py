@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, Header, Request, Response, status
+from fastapi.responses import JSONResponse
+
+from core import conditional
+from core.config import get_settings, Settings
+from core.dependencies import create_ndb_context
+from schemas.exception import ExceptionResponse
+from schemas.job import Job, MealRecipeJobRequest
+from schemas.shopping_list import ShoppingListRequest
+from services.job import (
+    get_job_record,
+    JobRecord,
+    request_meal_plan_job,
+    request_meal_recipe_job,
+    request_shopping_list_job,
+)
+
+router = APIRouter()
+settings: Settings = get_settings()
+
+
+def get_job_headers(record: JobRecord) -> dict[str, str]:
+    headers = {"ETag": record.etag}
+    if record.retry_after is not None:
+        headers["Retry-After"] = str(record.retry_after)
+
+    return headers
+
+
+def accepted_job_response(request: Request, record: JobRecord) -> JSONResponse:
+    headers = get_job_headers(record)
+    headers["Location"] = str(request.url_for("get_job", job_id=record.job.id))
+    return JSONResponse(record.job.model_dump(mode="json"), status_code=status.HTTP_202_ACCEPTED, headers=headers)
+
+
+@router.post(
+    "/meal-plans",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=Job,
+    responses={409: {"model": ExceptionResponse, "description": "A new meal plan is already in progress"}},
+    dependencies=[Depends(create_ndb_context)],
+)
+async def create_meal_plan_job(request: Request) -> JSONResponse:
+    record = await request_meal_plan_job(request)
+    return accepted_job_response(request, record)
+
+
+@router.post(
+    "/meal-recipes",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=Job,
+    responses={404: {"model": ExceptionResponse, "description": "Meal not found"}},
+    dependencies=[Depends(create_ndb_context)],
+)
+async def create_meal_recipe_job(request: Request, data: MealRecipeJobRequest) -> JSONResponse:
+    record = await request_meal_recipe_job(request, data)
+    return accepted_job_response(request, record)
+
+
+@router.post(
+    "/shopping-lists",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=Job,
+    dependencies=[Depends(create_ndb_context)],
+)
+async def create_shopping_list_job(request: Request, data: ShoppingListRequest) -> JSONResponse:
+    record = await request_shopping_list_job(request, data)
+    return accepted_job_response(request, record)
+
+
+@router.get(
+    "/{job_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=Job,
+    responses={
+        304: {"description": "Job status has not changed since the ETag sent in If-None-Match"},
+        404: {"model": ExceptionResponse, "description": "Job not found"},
+    },
+    dependencies=[Depends(create_ndb_context)],
+)
+async def get_job(request: Request, job_id: str, if_none_match: str | None = Header(None)) -> Response:
+    record = await get_job_record(request.state.user_id, job_id)
+    headers = get_job_headers(record)
+    if conditional.etag_matches(if_none_match, record.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return JSONResponse(record.job.model_dump(mode="json"), headers=headers)
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, Depends, Header, Request, Response, status
 from mealhow_sdk import enums
 
+from core import conditional
 from core.config import get_settings, Settings
 from core.dependencies import create_ndb_context
+from core.pagination import set_next_cursor_header
+from core.serialization import ResponseSerializer
 from schemas.exception import ExceptionResponse
 from schemas.meal import Meal, MealResponse
+from schemas.pagination import FieldsParams, PaginationParams
 from services.meal import (
     create_and_save_meal_recipe,
     create_image_artifact_report,
     get_favorite_meals_from_db,
     get_meal_from_db_by_key,
+    get_meals_with_references,
+    needs_recipe,
     save_meal_as_favorite_in_db,
     unmark_meals_as_favorite,
 )
@@ -17,6 +23,9 @@ from services.meal import (
 router = APIRouter()
 settings: Settings = get_settings()
 
+meal_serializer = ResponseSerializer(MealResponse)
+meals_serializer = ResponseSerializer(list[Meal])
+
 
 @router.get(
     "/favorite",
@@ -24,9 +33,15 @@ settings: Settings = get_settings()
     response_model=list[Meal],
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_favorite_meals(request: Request) -> list[Meal]:
-    favorite_meals = await get_favorite_meals_from_db(request.state.user_id)
-    return [Meal(**meal) for meal in favorite_meals]
+async def get_favorite_meals(
+    request: Request, pagination: PaginationParams = Depends(), fieldset: FieldsParams = Depends()
+) -> Response:
+    favorite_meals, next_cursor = await get_favorite_meals_from_db(
+        request.state.user_id, pagination.limit, pagination.cursor
+    )
+    response = meals_serializer.response(favorite_meals, fields=fieldset.fields)
+    set_next_cursor_header(response, next_cursor)
+    return response
 
 
 @router.delete(
@@ -62,25 +77,28 @@ async def delete_favorite_meal(request: Request, key: str) -> None:
     "/{key}",
     status_code=status.HTTP_200_OK,
     response_model=MealResponse,
-    responses={404: {"model": ExceptionResponse, "description": "Meal not found"}},
+    responses={
+        **conditional.NOT_MODIFIED_RESPONSE,
+        404: {"model": ExceptionResponse, "description": "Meal not found"},
+    },
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_meal_by_key(request: Request, key: str) -> MealResponse:
+async def get_meal_by_key(request: Request, key: str, if_none_match: str | None = Header(None)) -> Response:
     meal_entity = await get_meal_from_db_by_key(key)
 
-    if (
-        not meal_entity.recipe
-        and meal_entity.recipe_status != enums.JobStatus.in_progress.name
-        and meal_entity.preparation_time > 2
-    ):
+    if needs_recipe(meal_entity) and meal_entity.recipe_status != enums.JobStatus.in_progress.name:
         meal_entity = await create_and_save_meal_recipe(request, meal_entity)
 
-    meal = meal_entity.to_dict()
-    meal["image"] = meal_entity.image.get().to_dict()
-    if meal_entity.recipe:
-        meal["recipe"] = meal_entity.recipe.get().to_dict()
+    meal = (await get_meals_with_references([meal_entity], include_recipe=True))[0]
+    etag = conditional.get_etag(key, meal)
+    # Meal content only changes while its recipe is being generated
+    cache_control = (
+        conditional.REVALIDATE if meal_entity.recipe_status == enums.JobStatus.in_progress.name else conditional.STABLE
+    )
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
 
-    return MealResponse(**meal)
+    return meal_serializer.response(meal, headers=conditional.get_cache_headers(etag, cache_control))
 
 
 @router.post(
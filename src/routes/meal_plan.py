@@ -1,22 +1,43 @@
-from fastapi import APIRouter, Depends, Request, status
+import json
+from typing import AsyncIterator
 
-from core import custom_exceptions
+from fastapi import APIRouter, Depends, Header, Path, Request, Response, status
+from fastapi.responses import StreamingResponse
+from mealhow_sdk import enums
+
+from core import conditional, custom_exceptions
 from core.config import get_settings, Settings
 from core.dependencies import create_ndb_context
+from core.pagination import set_next_cursor_header
+from core.serialization import ResponseSerializer
 from schemas.exception import ExceptionResponse
-from schemas.meal_plan import CreateMealPlanResponse, MealPlan, MealPlanDayItem
+from schemas.meal_plan import (
+    CreateMealPlanResponse,
+    MealPlan,
+    MealPlanDayItem,
+    MealPlanSummary,
+)
+from schemas.pagination import FieldsParams, PaginationParams
 from schemas.user import PersonalInfo
 from services.meal_plan import (
+    get_archived_meal_plan_summaries_from_db,
     get_archived_meal_plans_from_db,
     get_current_meal_plan_from_db,
     get_in_progress_meal_plan_from_db,
+    get_meal_plan_by_key_from_db,
     request_meal_plan_preview,
     request_new_meal_plan,
+    stream_meal_plan_preview,
+    wait_for_in_progress_meal_plan,
 )
 
 router = APIRouter()
 settings: Settings = get_settings()
 
+meal_plan_serializer = ResponseSerializer(MealPlan)
+meal_plans_serializer = ResponseSerializer(list[MealPlan])
+meal_plan_summaries_serializer = ResponseSerializer(list[MealPlanSummary])
+
 
 @router.post(
     "/",
@@ -37,16 +58,40 @@ async def create_meal_plan(
     return CreateMealPlanResponse(meal_plan_id=new_meal_plan_id)
 
 
+@router.get(
+    "/in-progress/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    description="Server-sent events stream that emits `meal_plan_created` once the requested meal plan exists.",
+)
+async def stream_in_progress_meal_plan_events(request: Request) -> StreamingResponse:
+    async def event_stream(user_id: str) -> AsyncIterator[str]:
+        meal_plan_id = await wait_for_in_progress_meal_plan(user_id, settings.MEAL_PLAN_CREATION_TIMEOUT)
+        if meal_plan_id is None:
+            yield "event: timeout\ndata: {}\n\n"
+        else:
+            yield f"event: meal_plan_created\ndata: {json.dumps({'meal_plan_id': meal_plan_id})}\n\n"
+
+    return StreamingResponse(event_stream(request.state.user_id), media_type="text/event-stream")
+
+
 @router.get(
     "/current",
     status_code=status.HTTP_200_OK,
     response_model=MealPlan,
-    responses={404: {"model": ExceptionResponse, "description": "Meal plan not found"}},
+    responses={
+        **conditional.NOT_MODIFIED_RESPONSE,
+        404: {"model": ExceptionResponse, "description": "Meal plan not found"},
+    },
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_current_meal_plan(request: Request) -> MealPlan:
+async def get_current_meal_plan(request: Request, if_none_match: str | None = Header(None)) -> Response:
     meal_plan = await get_current_meal_plan_from_db(request.state.user_id)
-    return MealPlan(**meal_plan.to_dict())
+    etag = conditional.get_entity_etag(meal_plan)
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag)
+
+    return meal_plan_serializer.response(meal_plan.to_dict(), headers=conditional.get_cache_headers(etag))
 
 
 @router.get(
@@ -55,17 +100,106 @@ async def get_current_meal_plan(request: Request) -> MealPlan:
     response_model=list[MealPlan],
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_archived_meal_plans(request: Request) -> list[MealPlan]:
-    meal_plans = await get_archived_meal_plans_from_db(request.state.user_id)
-    return [MealPlan(**meal_plan.to_dict()) for meal_plan in meal_plans]
+async def get_archived_meal_plans(
+    request: Request, pagination: PaginationParams = Depends(), fieldset: FieldsParams = Depends()
+) -> Response:
+    meal_plans, next_cursor = await get_archived_meal_plans_from_db(
+        request.state.user_id, pagination.limit, pagination.cursor
+    )
+    response = meal_plans_serializer.response([meal_plan.to_dict() for meal_plan in meal_plans], fields=fieldset.fields)
+    set_next_cursor_header(response, next_cursor)
+    return response
+
+
+@router.get(
+    "/archived/summary",
+    status_code=status.HTTP_200_OK,
+    response_model=list[MealPlanSummary],
+    dependencies=[Depends(create_ndb_context)],
+)
+async def get_archived_meal_plan_summaries(
+    request: Request, pagination: PaginationParams = Depends(), fieldset: FieldsParams = Depends()
+) -> Response:
+    summaries, next_cursor = await get_archived_meal_plan_summaries_from_db(
+        request.state.user_id, pagination.limit, pagination.cursor
+    )
+    response = meal_plan_summaries_serializer.response(
+        [{"key": summary.key.id(), **summary.to_dict(exclude=["user", "created_at"])} for summary in summaries],
+        fields=fieldset.fields,
+    )
+    set_next_cursor_header(response, next_cursor)
+    return response
 
 
 @router.post(
     "/preview",
     status_code=status.HTTP_200_OK,
     response_model=MealPlanDayItem,
+    responses={
+        429: {"model": ExceptionResponse, "description": "Too many preview requests are queued"},
+        503: {"model": ExceptionResponse, "description": "No preview capacity freed up in time"},
+        504: {"model": ExceptionResponse, "description": "Preview generation timed out"},
+    },
     dependencies=[Depends(create_ndb_context)],
 )
 async def create_meal_plan_preview(data: PersonalInfo) -> MealPlanDayItem:
     res = await request_meal_plan_preview(data)
     return MealPlanDayItem(**res[1])
+
+
+@router.post(
+    "/preview/stream",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    description="Streams the meal plan preview as NDJSON frames: `accepted`, `heartbeat`, `meal`, `total` or `error`.",
+)
+async def create_meal_plan_preview_stream(data: PersonalInfo) -> StreamingResponse:
+    return StreamingResponse(stream_meal_plan_preview(data), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/{key}",
+    status_code=status.HTTP_200_OK,
+    response_model=MealPlan,
+    responses={
+        **conditional.NOT_MODIFIED_RESPONSE,
+        404: {"model": ExceptionResponse, "description": "Meal plan not found"},
+    },
+    dependencies=[Depends(create_ndb_context)],
+)
+async def get_meal_plan_by_key(request: Request, key: int, if_none_match: str | None = Header(None)) -> Response:
+    # Archived plans never change, so their ETag is answered without reading the plan again
+    stamp_key = ("meal_plan", request.state.user_id, key)
+    stamped_etag = conditional.get_etag_stamp(stamp_key)
+    if stamped_etag and conditional.etag_matches(if_none_match, stamped_etag):
+        return conditional.not_modified(stamped_etag, conditional.STABLE)
+
+    meal_plan = await get_meal_plan_by_key_from_db(request.state.user_id, key)
+    etag = conditional.get_entity_etag(meal_plan)
+    cache_control = conditional.REVALIDATE
+    if meal_plan.status == enums.MealPlanStatus.archived.name:
+        conditional.set_etag_stamp(stamp_key, etag)
+        cache_control = conditional.STABLE
+
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
+
+    return meal_plan_serializer.response(
+        meal_plan.to_dict(), headers=conditional.get_cache_headers(etag, cache_control)
+    )
+
+
+@router.get(
+    "/{key}/days/{day}",
+    status_code=status.HTTP_200_OK,
+    response_model=MealPlanDayItem,
+    responses={404: {"model": ExceptionResponse, "description": "Meal plan day not found"}},
+    dependencies=[Depends(create_ndb_context)],
+)
+async def get_meal_plan_day(request: Request, key: int, day: int = Path(ge=1, le=7)) -> MealPlanDayItem:
+    meal_plan = await get_meal_plan_by_key_from_db(request.state.user_id, key)
+    details = meal_plan.to_dict().get("details") or {}
+    if f"day_{day}" not in details:
+        raise custom_exceptions.NotFoundException("Meal plan day not found")
+
+    return MealPlanDayItem(**details[f"day_{day}"])
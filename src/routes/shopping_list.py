@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, Depends, Header, Request, Response, status
 
+from core import conditional
 from core.config import get_settings, Settings
 from core.dependencies import create_ndb_context
+from core.pagination import set_next_cursor_header
+from core.serialization import ResponseSerializer
 from schemas.exception import ExceptionResponse
 from schemas.meal import Meal
+from schemas.pagination import FieldsParams, PaginationParams
 from schemas.shopping_list import (
     ShoppingListRequest,
     ShoppingListWithCount,
@@ -22,6 +26,9 @@ from services.shopping_list import (
 router = APIRouter()
 settings: Settings = get_settings()
 
+shopping_list_serializer = ResponseSerializer(ShoppingListWithItems)
+shopping_lists_serializer = ResponseSerializer(list[ShoppingListWithCount])
+
 
 @router.get(
     "/",
@@ -29,15 +36,18 @@ settings: Settings = get_settings()
     response_model=list[ShoppingListWithCount],
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_shopping_lists(request: Request) -> list[ShoppingListWithCount]:
-    shopping_lists = await get_users_shopping_lists_from_db(request.state.user_id)
-    shopping_lists_with_count = []
-    for shopping_list in shopping_lists:
-        shopping_lists_with_count.append(
-            ShoppingListWithCount(**shopping_list.to_dict(), total_items=len(shopping_list.items))
-        )
-
-    return shopping_lists_with_count
+async def get_shopping_lists(
+    request: Request, pagination: PaginationParams = Depends(), fieldset: FieldsParams = Depends()
+) -> Response:
+    shopping_lists, next_cursor = await get_users_shopping_lists_from_db(
+        request.state.user_id, pagination.limit, pagination.cursor
+    )
+    response = shopping_lists_serializer.response(
+        [{**shopping_list.to_dict(), "total_items": len(shopping_list.items)} for shopping_list in shopping_lists],
+        fields=fieldset.fields,
+    )
+    set_next_cursor_header(response, next_cursor)
+    return response
 
 
 @router.post(
@@ -64,12 +74,19 @@ async def delete_list_of_shopping_lists(request: Request, keys: list[int]) -> No
     "/{key}",
     status_code=status.HTTP_200_OK,
     response_model=ShoppingListWithItems,
-    responses={404: {"model": ExceptionResponse, "description": "Shopping list not found"}},
+    responses={
+        **conditional.NOT_MODIFIED_RESPONSE,
+        404: {"model": ExceptionResponse, "description": "Shopping list not found"},
+    },
     dependencies=[Depends(create_ndb_context)],
 )
-async def get_shopping_list_by_key(request: Request, key: int) -> ShoppingListWithItems:
+async def get_shopping_list_by_key(request: Request, key: int, if_none_match: str | None = Header(None)) -> Response:
     shopping_list = await get_shopping_list_by_key_from_db(request.state.user_id, key)
-    return ShoppingListWithItems(**shopping_list.to_dict())
+    etag = conditional.get_entity_etag(shopping_list)
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag)
+
+    return shopping_list_serializer.response(shopping_list.to_dict(), headers=conditional.get_cache_headers(etag))
 
 
 @router.put(
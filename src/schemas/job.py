@@ -0,0 +1,27 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class JobType(str, Enum):
+    meal_plan = "meal_plan"
+    meal_recipe = "meal_recipe"
+    shopping_list = "shopping_list"
+
+
+class JobState(str, Enum):
+    pending = "pending"
+    in_progress = "in_progress"
+    completed = "completed"
+    failed = "failed"
+
+
+class Job(BaseModel):
+    id: str  # noqa: A003, VNE003
+    type: JobType  # noqa: A003, VNE003
+    status: JobState
+    resource_key: int | str | None = None
+
+
+class MealRecipeJobRequest(BaseModel):
+    meal_id: str
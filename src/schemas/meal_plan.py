@@ -1,3 +1,5 @@
+import datetime
+
 from mealhow_sdk import enums
 from pydantic import BaseModel
 
@@ -44,3 +46,11 @@ class MealPlan(BaseModel):
     key: int
     status: enums.MealPlanStatus
     details: MealPlanDetails | None
+
+
+class MealPlanSummary(BaseModel):
+    key: int
+    status: enums.MealPlanStatus
+    start_date: datetime.date
+    end_date: datetime.date
+    daily_totals: list[MealPlanDayTotalInfo]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+from core.config import get_settings, Settings
+
+settings: Settings = get_settings()
+
+
+class PaginationParams(BaseModel):
+    limit: int | None = Field(
+        None, ge=1, le=settings.PAGINATION_MAX_LIMIT, description="Page size; all items are returned when omitted"
+    )
+    cursor: str | None = None
+
+
+class FieldsParams(BaseModel):
+    fields: str | None = Field(None, description="Comma-separated list of the fields to return for each item")
@@ -1,7 +1,7 @@
+import asyncio
 import datetime
-from typing import Any
+from typing import Any, Awaitable, NoReturn
 
-import pycountry
 from auth0 import Auth0Error
 from auth0.authentication import GetToken
 from auth0.management import Auth0
@@ -9,11 +9,14 @@ from dateutil.relativedelta import relativedelta
 from fastapi import HTTPException, Request
 from google.cloud import ndb
 from mealhow_sdk import datastore_models
-from timezonefinder import TimezoneFinder
 
 from core.config import get_settings
+from core.datastore import datastore
+from core.geo import geo_lookup
+from core.logger import get_logger
+from core.metrics import metrics
 from schemas.user import CreateUser, LoginUser
-from services.payments import create_new_customer
+from services.payments import create_new_customer, delete_customer
 from services.user import (
     calculate_weight_and_height,
     get_bmr_and_total_calories_goal,
@@ -21,7 +24,7 @@ from services.user import (
 )
 
 settings = get_settings()
-tf = TimezoneFinder()
+logger = get_logger(__name__)
 
 
 async def extract_data_from_headers(request: Request) -> dict[str, Any]:
@@ -29,30 +32,22 @@ async def extract_data_from_headers(request: Request) -> dict[str, Any]:
     subdivision_iso_code = request.headers.get(settings.CLIENT_COUNTRY_SUBDIVISION_HEADER)
     location = request.headers.get(settings.CLIENT_LAT_LONG_HEADER).split(",")
 
-    try:
-        subdivision = pycountry.subdivisions.get(code=subdivision_iso_code).name
-    except AttributeError:
-        subdivision = subdivision_iso_code
-
-    try:
-        country = pycountry.countries.get(alpha_2=country_iso_code).name
-    except AttributeError:
-        country = country_iso_code
-
     return {
         "cdn_cache_id": request.headers.get(settings.CLIENT_CDN_CACHE_ID_HEADER),
         "client_protocol": request.headers.get(settings.CLIENT_PROTOCOL_HEADER),
-        "timezone": tf.timezone_at(lat=float(location[0].strip()), lng=float(location[1].strip())),
-        "country": country if country_iso_code else None,
-        "country_subdivision": subdivision if subdivision_iso_code else None,
+        "timezone": await geo_lookup.get_timezone(lat=float(location[0].strip()), lng=float(location[1].strip())),
+        "country": await geo_lookup.get_country_name(country_iso_code) if country_iso_code else None,
+        "country_subdivision": (
+            await geo_lookup.get_subdivision_name(subdivision_iso_code) if subdivision_iso_code else None
+        ),
     }
 
 
 async def create_user_db_entity(
-    request: Request, user_obj: CreateUser, auth0_user_obj: dict[str, Any], stripe_customer_id: str
+    user_obj: CreateUser, auth0_user_obj: dict[str, Any], stripe_customer_id: str, header_data: dict[str, Any]
 ) -> None:
-    body_params = await calculate_weight_and_height(user_obj.personal_info)
-    bmr, calories_goal = await get_bmr_and_total_calories_goal(body_params, user_obj.personal_info)
+    body_params = calculate_weight_and_height(user_obj.personal_info)
+    bmr, calories_goal = get_bmr_and_total_calories_goal(body_params, user_obj.personal_info)
 
     key = ndb.Key(datastore_models.User, auth0_user_obj["user_id"])
     user_entity = datastore_models.User(
@@ -71,42 +66,107 @@ async def create_user_db_entity(
         health_conditions=user_obj.personal_info.health_conditions,
         height_cm=body_params["height_cm"],
         height_inches=body_params["height_inches"],
-        current_weight=[await get_weight_record(body_params, "current_weight")],
-        weight_goal=[await get_weight_record(body_params, "weight_goal")],
+        current_weight=[get_weight_record(body_params, "current_weight")],
+        weight_goal=[get_weight_record(body_params, "weight_goal")],
         bmr=bmr,
         calories_goal=calories_goal,
         stripe_customer_id=stripe_customer_id,
         platform=user_obj.personal_info.platform,
         updated_at=datetime.datetime.now(),
-        **(await extract_data_from_headers(request)),
+        **header_data,
     )
-    user_entity.put()
+    await datastore.run(user_entity.put)
+
+
+async def run_signup_step(name: str, step: Awaitable[Any]) -> Any:
+    with metrics.timer(f"signup.{name}"):
+        return await step
+
+
+def raise_signup_error(error: BaseException) -> NoReturn:
+    if isinstance(error, Auth0Error):
+        raise HTTPException(status_code=error.status_code, detail=error.message)
+
+    raise error
+
+
+async def rollback_signup(
+    auth0_mgmt_client: Auth0, auth0_user_obj: dict[str, Any] | None, customer: dict[str, Any] | None
+) -> None:
+    """
+    Compensates the external side effects of a failed signup. Rollback failures are only logged,
+    so that the client receives the error that caused the rollback.
+    """
+    steps = []
+    if auth0_user_obj is not None:
+        steps.append(
+            run_signup_step("rollback_auth0_user", auth0_mgmt_client.users.delete_async(auth0_user_obj["user_id"]))
+        )
+    if customer is not None:
+        steps.append(run_signup_step("rollback_stripe_customer", delete_customer(customer["id"])))
+
+    for result in await asyncio.gather(*steps, return_exceptions=True):
+        if isinstance(result, BaseException):
+            logger.error("Signup rollback step failed: %s", result)
+
+    metrics.increment("signup.rollback")
 
 
 async def create_user_in_db_and_auth0(
     request: Request, auth0_mgmt_client: Auth0, auth0_token: GetToken, create_user: CreateUser
 ) -> dict[str, Any]:
-    try:
-        # Create user in auth0 db
-        create_user.nickname = create_user.email
-        new_user_body = dict(create_user.model_dump())
-        del new_user_body["personal_info"]
+    create_user.nickname = create_user.email
+    new_user_body = dict(create_user.model_dump())
+    del new_user_body["personal_info"]
+
+    # Invalid location headers fail the signup before anything has been created that would need a rollback
+    header_data = await run_signup_step("header_enrichment", extract_data_from_headers(request))
+
+    # The Auth0 user and the Stripe customer are independent of each other
+    new_user_auth0_obj: dict[str, Any] | BaseException
+    customer: dict[str, Any] | BaseException
+    new_user_auth0_obj, customer = await asyncio.gather(
+        run_signup_step("auth0_user", auth0_mgmt_client.users.create_async(body=new_user_body)),
+        run_signup_step("stripe_customer", create_new_customer(create_user.email, create_user.name)),
+        return_exceptions=True,
+    )
+    if isinstance(new_user_auth0_obj, BaseException) or isinstance(customer, BaseException):
+        await rollback_signup(
+            auth0_mgmt_client,
+            None if isinstance(new_user_auth0_obj, BaseException) else new_user_auth0_obj,
+            None if isinstance(customer, BaseException) else customer,
+        )
+        errors = [result for result in (new_user_auth0_obj, customer) if isinstance(result, BaseException)]
+        raise_signup_error(errors[0])
+
+    # Logging in only needs the Auth0 user, so it runs alongside the Datastore write
+    user_entity_result: None | BaseException
+    access_token: dict[str, Any] | BaseException
+    user_entity_result, access_token = await asyncio.gather(
+        run_signup_step(
+            "user_entity", create_user_db_entity(create_user, new_user_auth0_obj, customer["id"], header_data)
+        ),
+        run_signup_step(
+            "auth0_login",
+            auth0_token.login_async(
+                username=create_user.email,
+                password=create_user.password,
+                audience=settings.AUTH0_API_DEFAULT_AUDIENCE,
+                scope="openid profile email",
+                grant_type="password",
+                realm=settings.AUTH0_DEFAULT_DB_CONNECTION,
+            ),
+        ),
+        return_exceptions=True,
+    )
+    if isinstance(user_entity_result, BaseException):
+        await rollback_signup(auth0_mgmt_client, new_user_auth0_obj, customer)
+        raise_signup_error(user_entity_result)
 
-        new_user_auth0_obj = await auth0_mgmt_client.users.create_async(body=new_user_body)
-        customer = await create_new_customer(create_user.email, create_user.name)
-        await create_user_db_entity(request, create_user, new_user_auth0_obj, customer["id"])
+    if isinstance(access_token, BaseException):
+        raise_signup_error(access_token)
 
-        # Get access token for new user
-        return await auth0_token.login_async(
-            username=create_user.email,
-            password=create_user.password,
-            audience=settings.AUTH0_API_DEFAULT_AUDIENCE,
-            scope="openid profile email",
-            grant_type="password",
-            realm=settings.AUTH0_DEFAULT_DB_CONNECTION,
-        )
-    except Auth0Error as e:
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return access_token
 
 
 async def get_access_token(auth0_token: GetToken, data: LoginUser) -> dict[str, Any]:
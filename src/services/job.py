@@ -0,0 +1,184 @@
+import base64
+import datetime
+import hashlib
+import json
+import math
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from google.cloud import ndb
+from mealhow_sdk import enums
+from mealhow_sdk.datastore_models import Meal, MealPlan, ShoppingList, User
+
+from core import custom_exceptions
+from core.config import get_settings
+from core.datastore import datastore
+from schemas.job import Job, JobState, JobType, MealRecipeJobRequest
+from schemas.shopping_list import ShoppingListRequest
+from services.meal import create_and_save_meal_recipe, get_meal_from_db_by_key
+from services.meal_plan import (
+    get_in_progress_meal_plan_from_db,
+    publish_new_meal_plan_request,
+)
+from services.shopping_list import create_new_shopping_list_in_db
+
+settings = get_settings()
+
+FINAL_JOB_STATES = {JobState.completed, JobState.failed}
+
+
+class JobRecord:
+    """
+    A job resolved from the entity it tracks. Nothing is kept in memory: the job id encodes the job type, the
+    resource key and the creation time, so every instance (and a restarted one) answers for every job.
+    """
+
+    def __init__(self, job: Job, created_at: float) -> None:
+        self.job = job
+        self.created_at = created_at
+
+    @property
+    def etag(self) -> str:
+        return f'"{hashlib.sha1(self.job.model_dump_json().encode("utf-8")).hexdigest()}"'
+
+    @property
+    def retry_after(self) -> int | None:
+        if self.job.status in FINAL_JOB_STATES:
+            return None
+
+        return max(1, math.ceil(settings.JOB_STATUS_REFRESH_INTERVAL))
+
+
+def encode_job_id(job_type: JobType, resource_key: Any, created_at: float) -> str:
+    payload = json.dumps([job_type.value, resource_key, round(created_at, 3)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_job_id(job_id: str) -> tuple[JobType, Any, float]:
+    try:
+        payload = base64.urlsafe_b64decode(job_id + "=" * (-len(job_id) % 4))
+        job_type, resource_key, created_at = json.loads(payload)
+        return JobType(job_type), resource_key, float(created_at)
+    except (ValueError, TypeError):
+        raise custom_exceptions.NotFoundException("Job not found")
+
+
+def create_job_record(job_type: JobType, status: JobState, resource_key: Any = None) -> JobRecord:
+    created_at = time.time()
+    job = Job(
+        id=encode_job_id(job_type, resource_key, created_at), type=job_type, status=status, resource_key=resource_key
+    )
+    return JobRecord(job, created_at)
+
+
+async def get_meal_plan_job_state(user_id: str, key: int | None, created_at: float) -> tuple[JobState, Any]:
+    """
+    The plan id is only known once the worker has created the plan, so until then the job is resolved to the
+    user's first plan created after the job was.
+    """
+    if key is None:
+        meal_plans = await datastore.run(
+            MealPlan.query()
+            .filter(
+                ndb.AND(
+                    MealPlan.user == ndb.Key(User, user_id),
+                    MealPlan.status.IN(
+                        [
+                            enums.MealPlanStatus.in_progress.name,
+                            enums.MealPlanStatus.failed.name,
+                            enums.MealPlanStatus.active.name,
+                        ]
+                    ),
+                )
+            )
+            .fetch
+        )
+        since = datetime.datetime.fromtimestamp(created_at, datetime.timezone.utc).replace(tzinfo=None)
+        meal_plans = sorted(
+            (meal_plan for meal_plan in meal_plans if meal_plan.created_at >= since),
+            key=lambda meal_plan: meal_plan.created_at,
+        )
+        if not meal_plans:
+            # The worker has not picked the request up yet
+            return JobState.pending, None
+
+        meal_plan = meal_plans[0]
+    else:
+        meal_plan = await datastore.run(MealPlan.get_by_id, key)
+        if meal_plan and meal_plan.user.id() != user_id:
+            raise custom_exceptions.NotFoundException("Job not found")
+
+    if not meal_plan or meal_plan.status == enums.MealPlanStatus.failed.name:
+        return JobState.failed, key
+
+    if meal_plan.status == enums.MealPlanStatus.in_progress.name:
+        return JobState.in_progress, meal_plan.key.id()
+
+    return JobState.completed, meal_plan.key.id()
+
+
+async def get_meal_recipe_job_state(user_id: str, key: str, created_at: float) -> tuple[JobState, Any]:
+    meal = await datastore.run(Meal.get_by_id, key)
+    if meal and meal.recipe:
+        return JobState.completed, key
+
+    if not meal or meal.recipe_status == enums.JobStatus.failed.name:
+        return JobState.failed, key
+
+    return JobState.in_progress, key
+
+
+async def get_shopping_list_job_state(user_id: str, key: int, created_at: float) -> tuple[JobState, Any]:
+    shopping_list = await datastore.run(ShoppingList.get_by_id, key)
+    if shopping_list and shopping_list.user.id() != user_id:
+        raise custom_exceptions.NotFoundException("Job not found")
+
+    if not shopping_list or shopping_list.status == enums.JobStatus.failed.name:
+        return JobState.failed, key
+
+    if shopping_list.status == enums.JobStatus.in_progress.name:
+        return JobState.in_progress, key
+
+    return JobState.completed, key
+
+
+JOB_STATE_RESOLVERS: dict[JobType, Callable[[str, Any, float], Awaitable[tuple[JobState, Any]]]] = {
+    JobType.meal_plan: get_meal_plan_job_state,
+    JobType.meal_recipe: get_meal_recipe_job_state,
+    JobType.shopping_list: get_shopping_list_job_state,
+}
+
+
+async def request_meal_plan_job(request: Request) -> JobRecord:
+    if await get_in_progress_meal_plan_from_db(request.state.user_id):
+        raise custom_exceptions.ConflictException("A new meal plan is already in progress")
+
+    record = create_job_record(JobType.meal_plan, JobState.pending)
+    await publish_new_meal_plan_request(request)
+    return record
+
+
+async def request_meal_recipe_job(request: Request, data: MealRecipeJobRequest) -> JobRecord:
+    meal = await get_meal_from_db_by_key(data.meal_id)
+    if meal.recipe:
+        return create_job_record(JobType.meal_recipe, JobState.completed, meal.key.id())
+
+    if meal.recipe_status != enums.JobStatus.in_progress.name:
+        await create_and_save_meal_recipe(request, meal)
+
+    return create_job_record(JobType.meal_recipe, JobState.in_progress, meal.key.id())
+
+
+async def request_shopping_list_job(request: Request, data: ShoppingListRequest) -> JobRecord:
+    shopping_list = await create_new_shopping_list_in_db(request, data)
+    return create_job_record(JobType.shopping_list, JobState.in_progress, shopping_list.key.id())
+
+
+async def get_job_record(user_id: str, job_id: str) -> JobRecord:
+    job_type, resource_key, created_at = decode_job_id(job_id)
+    if time.time() - created_at > settings.JOB_TTL:
+        raise custom_exceptions.NotFoundException("Job not found")
+
+    status, resource_key = await JOB_STATE_RESOLVERS[job_type](user_id, resource_key, created_at)
+    return JobRecord(Job(id=job_id, type=job_type, status=status, resource_key=resource_key), created_at)
@@ -1,47 +1,143 @@
 import datetime
+import functools
 import json
 from typing import Any
 
 from fastapi import Request
 from google.cloud import ndb
 from mealhow_sdk import enums
-from mealhow_sdk.datastore_models import FavoriteMeal, Meal, MealImage, User
+from mealhow_sdk.datastore_models import FavoriteMeal, Meal, MealImage, MealRecipe, User
 
 from core import custom_exceptions
+from core.cache import EntityCache, get_shared_cache_backend
 from core.config import get_settings
-from core.helpers import get_pubsub_topic
+from core.datastore import datastore
+from core.loaders import EntityLoader, get_entities_from_db
+from core.pagination import fetch_page
+from core.pubsub import event_publisher
+from core.write_coalescing import WriteCoalescer
 
 settings = get_settings()
 
 
+def needs_recipe(meal: Meal) -> bool:
+    return not meal.recipe and meal.preparation_time > 2
+
+
+def is_meal_entity_cacheable(entity: Any) -> bool:
+    # Meals still getting a recipe are updated by the recipe worker, which cannot invalidate the local cache tier of
+    # every instance, so they are only cached once settled
+    if not isinstance(entity, Meal):
+        return True
+
+    return entity.recipe_status != enums.JobStatus.in_progress.name and not needs_recipe(entity)
+
+
+meal_entity_cache = EntityCache(
+    "meals",
+    kinds={Meal._get_kind(), MealImage._get_kind(), MealRecipe._get_kind()},
+    backend=get_shared_cache_backend(),
+    cacheable=is_meal_entity_cacheable,
+)
+
+# Favorite toggles, keyed by meal key
+favorite_meals_writer = WriteCoalescer(
+    "favorite_meals",
+    max_batch_size=settings.WRITE_COALESCING_MAX_BATCH_SIZE,
+    retries=settings.WRITE_COALESCING_RETRIES,
+    retry_delay=settings.WRITE_COALESCING_RETRY_DELAY,
+)
+
+
 async def get_meal_from_db_by_key(key: str) -> Meal:
-    meal = Meal.get_by_id(key)
+    meal = await meal_entity_cache.get(ndb.Key(Meal, key), get_entities_from_db)
     if not meal:
         raise custom_exceptions.NotFoundException("Meal not found")
 
     return meal
 
 
+async def get_meals_with_references(
+    meal_entities: list[Meal], include_recipe: bool = False, loader: EntityLoader | None = None
+) -> list[dict[str, Any]]:
+    """
+    Serialize meals together with their image (and optionally recipe), resolving all referenced entities in one batch.
+    """
+    loader = loader or EntityLoader(meal_entity_cache)
+    meal_entities = [meal for meal in meal_entities if meal]
+    references = [meal.image for meal in meal_entities]
+    if include_recipe:
+        references += [meal.recipe for meal in meal_entities if meal.recipe]
+
+    await loader.load_many(references)
+
+    meals = []
+    for meal_entity in meal_entities:
+        meal = meal_entity.to_dict()
+        meal["image"] = (await loader.load(meal_entity.image)).to_dict()
+        if include_recipe and meal_entity.recipe:
+            meal["recipe"] = (await loader.load(meal_entity.recipe)).to_dict()
+
+        meals.append(meal)
+
+    return meals
+
+
+def _mark_meal_recipe_in_progress(key: ndb.Key) -> Meal | None:
+    meal = key.get()
+    # The recipe may have been attached since the meal was last read
+    if meal and not meal.recipe:
+        meal.recipe_status = enums.JobStatus.in_progress.name
+        meal.put()
+
+    return meal
+
+
 async def create_and_save_meal_recipe(request: Request, meal: Meal) -> Meal:
-    topic = await get_pubsub_topic(settings.PUBSUB_MEAL_RECIPE_EVENT_TOPIC_ID)
+    """
+    Requests the recipe of `meal`, which may come from the entity cache. The meal is read from Datastore again before
+    it is written, so that a stale cached copy never overwrites a recipe the worker has attached in the meantime.
+    """
+    meal = await datastore.run(meal.key.get)
+    if not meal:
+        raise custom_exceptions.NotFoundException("Meal not found")
+
+    if meal.recipe or meal.recipe_status == enums.JobStatus.in_progress.name:
+        return meal
+
     event_body = json.dumps({"meal_id": meal.key.id()}).encode("utf-8")
-    request.state.pubsub_publisher.publish(topic, event_body)
+    await event_publisher.publish(
+        settings.PUBSUB_MEAL_RECIPE_EVENT_TOPIC_ID, event_body, ordering_key=request.state.user_id
+    )
+
+    meal = await datastore.run(ndb.transaction, functools.partial(_mark_meal_recipe_in_progress, meal.key))
+    await meal_entity_cache.invalidate(meal.key)
+    return meal
 
-    meal.recipe_status = enums.JobStatus.in_progress.name
-    return meal.put().get()
+
+def _report_image_artifact(key: ndb.Key) -> MealImage | None:
+    meal_image = key.get()
+    if meal_image:
+        meal_image.artifact_reported = True
+        meal_image.put()
+
+    return meal_image
 
 
 async def create_image_artifact_report(key: str) -> None:
-    meal_image = MealImage.get_by_id(key.split("-")[0])
+    meal_image_key = ndb.Key(MealImage, key.split("-")[0])
+    # Read and written in one transaction instead of from the entity cache, which may hold a stale copy
+    meal_image = await datastore.run(ndb.transaction, functools.partial(_report_image_artifact, meal_image_key))
     if not meal_image:
         raise custom_exceptions.NotFoundException("Meal image not found")
 
-    meal_image.artifact_reported = True
-    meal_image.put()
+    await meal_entity_cache.invalidate(meal_image_key)
 
 
-async def get_favorite_meals_from_db(user_id: str) -> list[dict[str, Any]]:
-    favorite_meals = (
+async def get_favorite_meals_from_db(
+    user_id: str, limit: int | None, cursor: str | None = None
+) -> tuple[list[dict[str, Any]], str | None]:
+    favorite_meals, next_cursor = await fetch_page(
         FavoriteMeal.query()
         .filter(
             ndb.AND(
@@ -49,59 +145,45 @@ async def get_favorite_meals_from_db(user_id: str) -> list[dict[str, Any]]:
                 FavoriteMeal.deleted_at == None,  # noqa: E711
             )
         )
-        .order(-FavoriteMeal.created_at)
-        .fetch()
+        .order(-FavoriteMeal.created_at),
+        limit,
+        cursor,
     )
-    meal_entities = ndb.get_multi([favorite_meal.meal for favorite_meal in favorite_meals])
-    meals = [meal.to_dict() for meal in meal_entities]
-
-    for meal in meals:
-        meal["image"] = meal["image"].get().to_dict()
-
-    return meals
+    loader = EntityLoader(meal_entity_cache)
+    meal_entities = await loader.load_many([favorite_meal.meal for favorite_meal in favorite_meals])
+    return await get_meals_with_references(meal_entities, loader=loader), next_cursor
 
 
 async def save_meal_as_favorite_in_db(user_id: str, meal_key: str) -> None:
-    meal = Meal.get_by_id(meal_key)
+    meal = await meal_entity_cache.get(ndb.Key(Meal, meal_key), get_entities_from_db)
     if not meal:
         raise custom_exceptions.NotFoundException("Meal not found")
 
-    favorite_meal = (
+    favorite_meals = await datastore.run(
         FavoriteMeal.query()
         .filter(
             ndb.AND(
                 FavoriteMeal.user == ndb.Key(User, user_id),
                 FavoriteMeal.meal == ndb.Key(Meal, meal_key),
-                FavoriteMeal.deleted_at != None,  # noqa: E711
             )
         )
-        .get()
+        .fetch
     )
-
-    if favorite_meal:
-        favorite_meal.deleted_at = None
-    else:
-        favorite_meal = (
-            FavoriteMeal.query()
-            .filter(
-                ndb.AND(
-                    FavoriteMeal.user == ndb.Key(User, user_id),
-                    FavoriteMeal.meal == ndb.Key(Meal, meal_key),
-                )
-            )
-            .get()
-        )
-
-        if favorite_meal:
-            raise custom_exceptions.ConflictException("Meal already saved to favorites")
-
+    # An active favorite wins over deleted ones, which can only be restored when there is none
+    favorite_meals.sort(key=lambda favorite: favorite.deleted_at is not None)
+    favorite_meal = favorite_meals[0] if favorite_meals else None
+    if favorite_meal is None:
         favorite_meal = FavoriteMeal(user=ndb.Key(User, user_id), meal=meal.key)
+    elif favorite_meal.deleted_at is None:
+        raise custom_exceptions.ConflictException("Meal already saved to favorites")
+    else:
+        favorite_meal.deleted_at = None
 
-    favorite_meal.put()
+    await favorite_meals_writer.put(user_id, {meal_key: favorite_meal})
 
 
 async def unmark_meals_as_favorite(user_id: str, meal_keys: list[str]) -> None:
-    favorite_meals = (
+    favorite_meals = await datastore.run(
         FavoriteMeal.query()
         .filter(
             ndb.AND(
@@ -110,10 +192,12 @@ async def unmark_meals_as_favorite(user_id: str, meal_keys: list[str]) -> None:
                 FavoriteMeal.deleted_at == None,  # noqa: E711
             )
         )
-        .fetch()
+        .fetch
     )
 
-    for meal in favorite_meals:
-        meal.deleted_at = datetime.datetime.now()
+    for favorite_meal in favorite_meals:
+        favorite_meal.deleted_at = datetime.datetime.now()
 
-    ndb.put_multi(favorite_meals)
+    await favorite_meals_writer.put(
+        user_id, {favorite_meal.meal.id(): favorite_meal for favorite_meal in favorite_meals}
+    )
@@ -1,27 +1,68 @@
 import asyncio
 import datetime
 import json
-from typing import Any
+import random
+from typing import Any, AsyncIterator
 
 import mealhow_sdk
-from dateutil.relativedelta import relativedelta
-from fastapi import Request
+from fastapi import HTTPException, Request
 from google.cloud import ndb
 from mealhow_sdk import enums, prompt_templates
 from mealhow_sdk.datastore_models import MealPlan, User
 
 from core import custom_exceptions
+from core.admission import AdmissionController
+from core.cache import TTLCache
+from core.concurrency import single_flight, SingleFlight
 from core.config import get_settings
 from core.custom_exceptions import CreateMealPlanTimeoutException
-from core.helpers import get_pubsub_topic
-from schemas.user import PatchPersonalInfo, PersonalInfo
-from services.user import calculate_weight_and_height, get_bmr_and_total_calories_goal
+from core.datastore import datastore
+from core.logger import get_logger
+from core.metrics import metrics
+from core.notifications import (
+    CompletionListener,
+    CompletionNotifier,
+    PollingCompletionListener,
+    PubSubCompletionListener,
+)
+from core.pagination import fetch_page
+from core.pubsub import event_publisher
+from models.meal_plan_summary import MealPlanSummary
+from schemas.meal_plan import MealPlanDayItem
+from schemas.user import PersonalInfo
+from services.user import (
+    calculate_weight_and_height,
+    get_bmr_and_total_calories_goal,
+    get_user_profile,
+    store_calories_goal,
+)
 
 settings = get_settings()
+logger = get_logger(__name__)
+
+meal_plan_notifier = CompletionNotifier()
+
+# Generated previews, pooled per bucket of normalized prompt inputs
+meal_plan_previews = TTLCache(
+    max_size=settings.MEAL_PLAN_PREVIEW_CACHE_SIZE,
+    ttl=settings.MEAL_PLAN_PREVIEW_CACHE_TTL,
+)
+meal_plan_preview_requests = TTLCache(
+    max_size=settings.MEAL_PLAN_PREVIEW_CACHE_SIZE,
+    ttl=settings.MEAL_PLAN_PREVIEW_CACHE_TTL,
+)
+meal_plan_preview_flights = SingleFlight()
+meal_plan_preview_admission = AdmissionController(
+    "meal_plan_preview",
+    max_concurrency=settings.OPENAI_PREVIEW_MAX_CONCURRENCY,
+    max_queue_size=settings.OPENAI_PREVIEW_MAX_QUEUE_SIZE,
+    timeout=settings.OPENAI_PREVIEW_TIMEOUT,
+)
+meal_plan_preview_tasks: set[asyncio.Task] = set()
 
 
 async def get_in_progress_meal_plan_from_db(user_id: str) -> MealPlan:
-    return (
+    return await datastore.run(
         MealPlan.query()
         .filter(
             ndb.AND(
@@ -29,12 +70,67 @@ async def get_in_progress_meal_plan_from_db(user_id: str) -> MealPlan:
                 MealPlan.status == enums.MealPlanStatus.in_progress.name,
             )
         )
-        .get()
+        .get
+    )
+
+
+def _get_in_progress_meal_plan_ids(user_ids: list[str]) -> dict[str, int]:
+    meal_plan_ids = {}
+    for i in range(0, len(user_ids), 30):
+        meal_plans = (
+            MealPlan.query()
+            .filter(
+                ndb.AND(
+                    MealPlan.user.IN([ndb.Key(User, user_id) for user_id in user_ids[i : i + 30]]),
+                    MealPlan.status == enums.MealPlanStatus.in_progress.name,
+                )
+            )
+            .fetch()
+        )
+        meal_plan_ids.update({meal_plan.user.id(): meal_plan.key.id() for meal_plan in meal_plans})
+
+    return meal_plan_ids
+
+
+async def get_in_progress_meal_plan_ids_from_db(user_ids: list[str]) -> dict[str, int]:
+    return await datastore.run(_get_in_progress_meal_plan_ids, user_ids)
+
+
+def get_meal_plan_completion_listener() -> CompletionListener:
+    if settings.PUBSUB_MEAL_PLAN_COMPLETION_SUBSCRIPTION_ID:
+        return PubSubCompletionListener(
+            meal_plan_notifier,
+            subscription_path=f"projects/{settings.PROJECT_ID}/subscriptions/"
+            f"{settings.PUBSUB_MEAL_PLAN_COMPLETION_SUBSCRIPTION_ID}",
+            key_field="user_id",
+            value_field="meal_plan_id",
+            max_age=settings.MEAL_PLAN_CREATION_TIMEOUT,
+        )
+
+    return PollingCompletionListener(
+        meal_plan_notifier,
+        poll=get_in_progress_meal_plan_ids_from_db,
+        interval=settings.MEAL_PLAN_COMPLETION_POLL_INTERVAL,
     )
 
 
+async def wait_for_in_progress_meal_plan(user_id: str, timeout: float) -> int | None:
+    waiter = meal_plan_notifier.register(user_id)
+    try:
+        meal_plan_ids = await get_in_progress_meal_plan_ids_from_db([user_id])
+        if user_id in meal_plan_ids:
+            return meal_plan_ids[user_id]
+
+        return await meal_plan_notifier.wait(user_id, waiter, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        meal_plan_notifier.unregister(user_id, waiter)
+
+
+@single_flight("current_meal_plan")
 async def get_current_meal_plan_from_db(user_id: str) -> MealPlan:
-    meal_plan = (
+    meal_plan = await datastore.run(
         MealPlan.query()
         .filter(
             ndb.AND(
@@ -46,7 +142,7 @@ async def get_current_meal_plan_from_db(user_id: str) -> MealPlan:
                 ),
             )
         )
-        .get()
+        .get
     )
 
     if not meal_plan:
@@ -55,8 +151,10 @@ async def get_current_meal_plan_from_db(user_id: str) -> MealPlan:
     return meal_plan
 
 
-async def get_archived_meal_plans_from_db(user_id: str) -> list[MealPlan]:
-    return (
+async def get_archived_meal_plans_from_db(
+    user_id: str, limit: int | None, cursor: str | None = None
+) -> tuple[list[MealPlan], str | None]:
+    return await fetch_page(
         MealPlan.query()
         .filter(
             ndb.AND(
@@ -64,52 +162,106 @@ async def get_archived_meal_plans_from_db(user_id: str) -> list[MealPlan]:
                 MealPlan.status == enums.MealPlanStatus.archived.name,
             )
         )
-        .order(-MealPlan.created_at)
-        .fetch()
+        .order(-MealPlan.created_at),
+        limit,
+        cursor,
     )
 
 
-async def request_new_meal_plan(request: Request) -> str:
-    topic = await get_pubsub_topic(settings.PUBSUB_MEAL_PLAN_EVENT_TOPIC_ID)
+def create_meal_plan_summary(meal_plan: MealPlan) -> MealPlanSummary:
+    details = meal_plan.to_dict().get("details") or {}
+    start_date = meal_plan.created_at.date()
+    return MealPlanSummary(
+        key=ndb.Key(MealPlanSummary, meal_plan.key.id()),
+        user=meal_plan.user,
+        status=meal_plan.status,
+        start_date=start_date,
+        end_date=start_date + datetime.timedelta(days=len(details) - 1 if details else 0),
+        daily_totals=[details[day]["total"] for day in sorted(details, key=lambda day: int(day.split("_")[1]))],
+    )
 
-    user_id = request.state.user_id
-    user = User.get_by_id(user_id)
-
-    current_weight = sorted(user.current_weight, key=lambda x: x.created_at, reverse=True)[0]
-    bmr, calories_goal = await get_bmr_and_total_calories_goal(
-        {
-            "current_weight_kg": current_weight.weight_kg,
-            "height_cm": user.height_cm,
-        },
-        PatchPersonalInfo(
-            activity_level=user.activity_level,
-            goal=user.goal,
-            biological_sex=user.biological_sex,
-            age=relativedelta(datetime.datetime.now(), user.birth_year).years,
-        ),
+
+def _get_meal_plan_summaries(meal_plan_keys: list[ndb.Key]) -> list[MealPlanSummary]:
+    summaries = ndb.get_multi([ndb.Key(MealPlanSummary, key.id()) for key in meal_plan_keys])
+    missing_keys = [key for key, summary in zip(meal_plan_keys, summaries) if summary is None]
+    if missing_keys:
+        # Summaries of plans archived before they were introduced are backfilled on first read
+        new_summaries = {
+            summary.key.id(): summary
+            for summary in (
+                create_meal_plan_summary(meal_plan) for meal_plan in ndb.get_multi(missing_keys) if meal_plan
+            )
+        }
+        ndb.put_multi(list(new_summaries.values()))
+        summaries = [summary or new_summaries.get(key.id()) for key, summary in zip(meal_plan_keys, summaries)]
+
+    return [summary for summary in summaries if summary]
+
+
+async def get_archived_meal_plan_summaries_from_db(
+    user_id: str, limit: int | None, cursor: str | None = None
+) -> tuple[list[MealPlanSummary], str | None]:
+    meal_plan_keys, next_cursor = await fetch_page(
+        MealPlan.query()
+        .filter(
+            ndb.AND(
+                MealPlan.user == ndb.Key(User, user_id),
+                MealPlan.status == enums.MealPlanStatus.archived.name,
+            )
+        )
+        .order(-MealPlan.created_at),
+        limit,
+        cursor,
+        keys_only=True,
     )
-    user.bmr = bmr
-    user.calories_goal = calories_goal
-    user.put()
+    return await datastore.run(_get_meal_plan_summaries, meal_plan_keys), next_cursor
+
+
+async def get_meal_plan_by_key_from_db(user_id: str, key: int) -> MealPlan:
+    meal_plan = await datastore.run(MealPlan.get_by_id, key)
+    if not meal_plan or meal_plan.user.id() != user_id:
+        raise custom_exceptions.NotFoundException("Meal plan not found")
+
+    return meal_plan
+
+
+async def publish_new_meal_plan_request(request: Request) -> None:
+    user_id = request.state.user_id
+    profile = await get_user_profile(user_id)
+    if not profile:
+        raise custom_exceptions.NotFoundException("User not found")
+
+    if profile.is_outdated:
+        await store_calories_goal(user_id)
 
     data = json.dumps({"user_id": user_id}).encode("utf-8")
-    request.state.pubsub_publisher.publish(topic, data)
+    await event_publisher.publish(settings.PUBSUB_MEAL_PLAN_EVENT_TOPIC_ID, data, ordering_key=user_id)
 
-    meal_plan = None
-    number_of_retries = 0
-    while not meal_plan:
-        await asyncio.sleep(1)
-        meal_plan = await get_in_progress_meal_plan_from_db(user_id)
-        number_of_retries += 1
-        if number_of_retries == 30:
-            raise CreateMealPlanTimeoutException
 
-    return meal_plan.key.id()
+async def request_new_meal_plan(request: Request) -> int:
+    user_id = request.state.user_id
+    waiter = meal_plan_notifier.register(user_id)
+    try:
+        await publish_new_meal_plan_request(request)
+        return await meal_plan_notifier.wait(user_id, waiter, settings.MEAL_PLAN_CREATION_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise CreateMealPlanTimeoutException
+    finally:
+        meal_plan_notifier.unregister(user_id, waiter)
 
 
-async def request_meal_plan_preview(data: PersonalInfo) -> dict[int, dict[str, Any]]:
-    body_params = await calculate_weight_and_height(data)
-    _, calories_goal = await get_bmr_and_total_calories_goal(body_params, data)
+def get_meal_plan_preview_key(calories_goal: int, data: PersonalInfo) -> tuple:
+    return (
+        calories_goal,
+        data.protein_goal,
+        data.meal_prep_time,
+        tuple(sorted(data.preferred_cuisines)),
+        tuple(sorted(data.avoid_ingredients)),
+        tuple(sorted(data.health_conditions)),
+    )
+
+
+async def generate_meal_plan_preview(calories_goal: int, data: PersonalInfo) -> dict[int, dict[str, Any]]:
     prompt = await mealhow_sdk.get_openai_meal_plan_prompt(
         mealhow_sdk.MealPlanPromptInputData(
             calories_goal=calories_goal,
@@ -131,3 +283,88 @@ async def request_meal_plan_preview(data: PersonalInfo) -> dict[int, dict[str, A
         daily_calories_goal=calories_goal,
         plan_length=1,
     )
+
+
+async def generate_and_pool_meal_plan_preview(
+    key: tuple, calories_goal: int, data: PersonalInfo
+) -> dict[int, dict[str, Any]]:
+    preview = await meal_plan_preview_admission.run(lambda: generate_meal_plan_preview(calories_goal, data))
+    meal_plan_previews.set(key, meal_plan_previews.get(key, []) + [preview])
+    return preview
+
+
+async def refill_meal_plan_preview_pool(key: tuple, calories_goal: int, data: PersonalInfo) -> None:
+    try:
+        await meal_plan_preview_flights.do(key, lambda: generate_and_pool_meal_plan_preview(key, calories_goal, data))
+    except Exception:
+        logger.exception("Meal plan preview pool refill failed")
+
+
+async def request_meal_plan_preview(data: PersonalInfo) -> dict[int, dict[str, Any]]:
+    """
+    Previews are memoized per bucket of normalized inputs. Buckets requested at least
+    `MEAL_PLAN_PREVIEW_POOL_MIN_REQUESTS` times keep up to `MEAL_PLAN_PREVIEW_POOL_SIZE` pre-generated variations,
+    topped up in the background, so popular inputs don't all get the same plan.
+    """
+    body_params = calculate_weight_and_height(data)
+    _, calories_goal = get_bmr_and_total_calories_goal(body_params, data)
+
+    key = get_meal_plan_preview_key(calories_goal, data)
+    requests_count = meal_plan_preview_requests.get(key, 0) + 1
+    meal_plan_preview_requests.set(key, requests_count)
+
+    pool = meal_plan_previews.get(key)
+    if not pool:
+        metrics.increment("cache.meal_plan_preview.miss")
+        return await meal_plan_preview_flights.do(
+            key, lambda: generate_and_pool_meal_plan_preview(key, calories_goal, data)
+        )
+
+    metrics.increment("cache.meal_plan_preview.hit")
+    if (
+        requests_count >= settings.MEAL_PLAN_PREVIEW_POOL_MIN_REQUESTS
+        and len(pool) < settings.MEAL_PLAN_PREVIEW_POOL_SIZE
+        and not meal_plan_preview_flights.is_running(key)
+        and meal_plan_preview_admission.has_capacity()
+    ):
+        task = asyncio.create_task(refill_meal_plan_preview_pool(key, calories_goal, data))
+        meal_plan_preview_tasks.add(task)
+        task.add_done_callback(meal_plan_preview_tasks.discard)
+
+    return random.choice(pool)
+
+
+def get_meal_plan_preview_frame(event: str, data: Any = None) -> bytes:
+    return json.dumps({"event": event, "data": data}).encode("utf-8") + b"\n"
+
+
+async def stream_meal_plan_preview(data: PersonalInfo) -> AsyncIterator[bytes]:
+    """
+    NDJSON preview stream: an `accepted` frame right away, `heartbeat` frames while the plan is generated,
+    then one `meal` frame per meal and a final `total` frame, both shaped after `MealPlanDayItem`.
+    Errors after the stream has started are reported as an `error` frame.
+    """
+    yield get_meal_plan_preview_frame("accepted")
+
+    preview_task = asyncio.ensure_future(request_meal_plan_preview(data))
+    try:
+        while not preview_task.done():
+            await asyncio.wait({preview_task}, timeout=settings.MEAL_PLAN_PREVIEW_STREAM_HEARTBEAT_INTERVAL)
+            if not preview_task.done():
+                yield get_meal_plan_preview_frame("heartbeat")
+
+        day = MealPlanDayItem(**preview_task.result()[1])
+    except HTTPException as e:
+        yield get_meal_plan_preview_frame("error", {"message": e.detail, "status_code": e.status_code})
+        return
+    except Exception:
+        logger.exception("Meal plan preview stream failed")
+        yield get_meal_plan_preview_frame("error", {"message": "Internal Server Error", "status_code": 500})
+        return
+    finally:
+        preview_task.cancel()
+
+    for meal in day.meals:
+        yield get_meal_plan_preview_frame("meal", meal.model_dump(mode="json"))
+
+    yield get_meal_plan_preview_frame("total", day.total.model_dump(mode="json"))
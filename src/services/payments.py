@@ -5,3 +5,7 @@ from async_stripe import stripe
 
 async def create_new_customer(email: str, name: str) -> Any:
     return await stripe.Customer.create(email=email, name=name)
+
+
+async def delete_customer(customer_id: str) -> Any:
+    return await stripe.Customer.delete(customer_id)
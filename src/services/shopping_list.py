@@ -8,15 +8,32 @@ from mealhow_sdk import enums
 from mealhow_sdk.datastore_models import Meal, ShoppingList, ShoppingListItem, User
 
 from core import custom_exceptions
+from core.concurrency import single_flight
 from core.config import get_settings
-from core.helpers import get_pubsub_topic
+from core.datastore import datastore
+from core.loaders import EntityLoader
+from core.pagination import fetch_page
+from core.pubsub import event_publisher
+from core.write_coalescing import WriteCoalescer
 from schemas.shopping_list import ShoppingListRequest, UpdateShoppingListRequest
+from services.meal import get_meals_with_references, meal_entity_cache
 
 settings = get_settings()
 
+# Checkmark and rename updates, keyed by shopping list key
+shopping_lists_writer = WriteCoalescer(
+    "shopping_lists",
+    max_batch_size=settings.WRITE_COALESCING_MAX_BATCH_SIZE,
+    retries=settings.WRITE_COALESCING_RETRIES,
+    retry_delay=settings.WRITE_COALESCING_RETRY_DELAY,
+)
 
-async def get_users_shopping_lists_from_db(user_id: str) -> list[ShoppingList]:
-    return (
+
+@single_flight("shopping_lists")
+async def get_users_shopping_lists_from_db(
+    user_id: str, limit: int | None, cursor: str | None = None
+) -> tuple[list[ShoppingList], str | None]:
+    return await fetch_page(
         ShoppingList.query()
         .order(ShoppingList.status)
         .filter(
@@ -26,13 +43,14 @@ async def get_users_shopping_lists_from_db(user_id: str) -> list[ShoppingList]:
                 ShoppingList.deleted_at == None,  # noqa: E711
             )
         )
-        .order(-ShoppingList.created_at)
-        .fetch()
+        .order(-ShoppingList.created_at),
+        limit,
+        cursor,
     )
 
 
 async def get_shopping_list_by_key_from_db(user_id: str, key: int) -> ShoppingList:
-    shopping_list = (
+    shopping_list = await datastore.run(
         ShoppingList.query()
         .filter(
             ndb.AND(
@@ -41,7 +59,7 @@ async def get_shopping_list_by_key_from_db(user_id: str, key: int) -> ShoppingLi
                 ShoppingList.deleted_at == None,  # noqa: E711
             )
         )
-        .get()
+        .get
     )
 
     if not shopping_list:
@@ -57,10 +75,10 @@ async def get_shopping_lists_from_db(user_id: str, keys: list[int]) -> list[Shop
     elif not keys:
         return []
     else:
-        shopping_lists = ndb.get_multi([ndb.Key(ShoppingList, key) for key in keys])
+        shopping_lists = await datastore.run(ndb.get_multi, [ndb.Key(ShoppingList, key) for key in keys])
 
         for shopping_list in shopping_lists:
-            if shopping_list.user.id() == user_id and not shopping_list.deleted_at:
+            if shopping_list and shopping_list.user.id() == user_id and not shopping_list.deleted_at:
                 filtered_shopping_lists.append(shopping_list)
 
     return filtered_shopping_lists
@@ -71,7 +89,9 @@ async def delete_shopping_lists_from_db(user_id: str, keys: list[int]) -> None:
     for shopping_list in shopping_lists:
         shopping_list.deleted_at = datetime.datetime.utcnow()
 
-    ndb.put_multi(shopping_lists)
+    await shopping_lists_writer.put(
+        user_id, {shopping_list.key.id(): shopping_list for shopping_list in shopping_lists}
+    )
 
 
 async def create_new_shopping_list_in_db(request: Request, data: ShoppingListRequest) -> ShoppingList:
@@ -82,36 +102,38 @@ async def create_new_shopping_list_in_db(request: Request, data: ShoppingListReq
         linked_meals=meal_keys,
         status=enums.JobStatus.in_progress.name,
     )
-    shopping_list_key = shopping_list.put()
-    shopping_list_entity = shopping_list_key.get()
+    await datastore.run(shopping_list.put)
 
-    topic = await get_pubsub_topic(settings.PUBSUB_SHOPPING_LIST_EVENT_TOPIC_ID)
     event_body = json.dumps(
         {
-            "shopping_list_id": shopping_list_entity.key.id(),
+            "shopping_list_id": shopping_list.key.id(),
             "meal_ids": data.meal_ids,
         }
     ).encode("utf-8")
-    request.state.pubsub_publisher.publish(topic, event_body)
+    try:
+        await event_publisher.publish(
+            settings.PUBSUB_SHOPPING_LIST_EVENT_TOPIC_ID, event_body, ordering_key=request.state.user_id
+        )
+    except custom_exceptions.ServiceUnavailableException:
+        # Without the event nothing will ever fill the list, so it must not stay in progress
+        shopping_list.status = enums.JobStatus.failed.name
+        await datastore.run(shopping_list.put)
+        raise
 
-    return shopping_list_entity
+    return shopping_list
 
 
 async def get_linked_meals_to_shopping_list_from_db(user_id: str, key: int) -> list[dict[str, Any]]:
     shopping_list = await get_shopping_list_by_key_from_db(user_id, key)
-    meal_entities = ndb.get_multi(shopping_list.linked_meals)
-    meals = [meal.to_dict() for meal in meal_entities]
-
-    for meal in meals:
-        meal["image"] = meal["image"].get().to_dict()
-
-    return meals
+    loader = EntityLoader(meal_entity_cache)
+    meal_entities = await loader.load_many(shopping_list.linked_meals)
+    return await get_meals_with_references(meal_entities, loader=loader)
 
 
 async def update_shopping_list_by_key_in_db(user_id: str, key: int, data: UpdateShoppingListRequest) -> ShoppingList:
     shopping_list = await get_shopping_list_by_key_from_db(user_id, key)
     shopping_list.name = data.name.strip().lower()
     shopping_list.items = [ShoppingListItem(**i.model_dump()) for i in data.items]
-    shopping_list.put()
+    await shopping_lists_writer.put(user_id, {key: shopping_list})
 
     return shopping_list
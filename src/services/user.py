@@ -1,92 +1,175 @@
 import datetime
+import functools
 from typing import Any
 
 from auth0 import Auth0Error
 from auth0.authentication import Database
 from dateutil.relativedelta import relativedelta
 from fastapi import HTTPException, Request
-from mealhow_sdk import datastore_models, enums, helpers
+from google.cloud import ndb
+from mealhow_sdk import datastore_models, enums
 from mealhow_sdk.datastore_models import User
 
+from core import custom_exceptions, nutrition
+from core.cache import TTLCache
+from core.concurrency import single_flight
 from core.config import get_settings
+from core.datastore import datastore
 from schemas.user import PatchPersonalInfo, PersonalInfo
 
 settings = get_settings()
 
 
-async def get_bmr_and_total_calories_goal(
+class UserProfile:
+    """
+    A `User` entity together with the values derived from it: latest weight records, age, BMR and calories goal.
+    """
+
+    def __init__(self, user: User, bmr: int, calories_goal: int) -> None:
+        self.user = user
+        self.current_weight = get_latest_weight_record(user.current_weight)
+        self.weight_goal = get_latest_weight_record(user.weight_goal)
+        self.age = relativedelta(datetime.datetime.now(), user.birth_year).years
+        self.bmr = bmr
+        self.calories_goal = calories_goal
+
+    @property
+    def is_outdated(self) -> bool:
+        return self.user.bmr != self.bmr or self.user.calories_goal != self.calories_goal
+
+
+# Profiles are cached per instance, so the TTL bounds how long another instance may serve a stale profile
+user_profiles = TTLCache(settings.USER_PROFILE_CACHE_SIZE, settings.USER_PROFILE_CACHE_TTL)
+# Versions and the number of in-flight loads of the profiles being loaded. A write bumps the version of a profile
+# that is being loaded, so a load that read the user before the write does not cache its stale profile
+profile_versions: dict[str, int] = {}
+profile_loads: dict[str, int] = {}
+
+
+def get_latest_weight_record(weight_records: list[datastore_models.WeightRecord]) -> datastore_models.WeightRecord:
+    return max(weight_records, key=lambda x: x.created_at)
+
+
+def get_bmr_and_total_calories_goal(
     body_params: dict[str, Any], personal_info: PersonalInfo | PatchPersonalInfo
 ) -> tuple[int, int]:
-    bmr_hb = await helpers.get_basal_metabolic_rate_harris_benedict(
-        weight=body_params["current_weight_kg"],
-        height=body_params["height_cm"],
-        age=personal_info.age,
-        sex=personal_info.biological_sex,
-    )
-    bmr_msj = await helpers.get_basal_metabolic_rate_mifflin_st_jeor(
-        weight=body_params["current_weight_kg"],
-        height=body_params["height_cm"],
+    if personal_info.age is None:
+        raise ValueError("The BMR cannot be computed without an age")
+
+    bmr = nutrition.get_bmr(
+        weight_kg=body_params["current_weight_kg"],
+        height_cm=body_params["height_cm"],
         age=personal_info.age,
         sex=personal_info.biological_sex,
     )
-    bmr = int(round((bmr_hb + bmr_msj) / 2))
-    activity_adjusted_bmr = await helpers.get_calories_goal_by_activity_level(bmr, personal_info.activity_level)
-    calories_goal = await helpers.get_calories_goal_by_goal_type(activity_adjusted_bmr, personal_info.goal)
-    calories_goal = await helpers.round_calories_goal_to_nearest_100(calories_goal)
+    calories_goal = nutrition.get_calories_goal(bmr, personal_info.activity_level, personal_info.goal)
 
     return bmr, calories_goal
 
 
-async def get_weight_record(body_params: dict[str, Any], key_prefix: str) -> datastore_models.WeightRecord:
+def get_weight_record(body_params: dict[str, Any], key_prefix: str) -> datastore_models.WeightRecord:
     return datastore_models.WeightRecord(
         weight_lbs=body_params[f"{key_prefix}_lbs"],
         weight_kg=body_params[f"{key_prefix}_kg"],
-        bmi=await helpers.get_bmi(body_params[f"{key_prefix}_kg"], body_params["height_cm"]),
+        bmi=nutrition.get_bmi(body_params[f"{key_prefix}_kg"], body_params["height_cm"]),
     )
 
 
-async def calculate_weight_and_height(personal_info: PersonalInfo | PatchPersonalInfo) -> dict[str, Any]:
-    params = {}
+def calculate_weight_and_height(personal_info: PersonalInfo | PatchPersonalInfo) -> dict[str, Any]:
+    params: dict[str, Any] = {}
     if personal_info.measurement_system == enums.MeasurementSystem.metric.value:
         params["height_cm"] = personal_info.height
         params["current_weight_kg"] = personal_info.current_weight
         params["weight_goal_kg"] = personal_info.weight_goal
-        params["height_inches"] = await helpers.convert_height_to_imperial(params["height_cm"])
-        params["current_weight_lbs"] = await helpers.convert_weight_to_imperial(params["current_weight_kg"])
-        params["weight_goal_lbs"] = await helpers.convert_weight_to_imperial(params["weight_goal_kg"])
+        params["height_inches"] = nutrition.convert_height_to_imperial(params["height_cm"])
+        params["current_weight_lbs"] = nutrition.convert_weight_to_imperial(params["current_weight_kg"])
+        params["weight_goal_lbs"] = nutrition.convert_weight_to_imperial(params["weight_goal_kg"])
     else:
         params["height_inches"] = personal_info.height
         params["current_weight_lbs"] = personal_info.current_weight
         params["weight_goal_lbs"] = personal_info.weight_goal
-        params["height_cm"] = await helpers.convert_height_to_metric(params["height_inches"])
-        params["current_weight_kg"] = await helpers.convert_weight_to_metric(params["current_weight_lbs"])
-        params["weight_goal_kg"] = await helpers.convert_weight_to_metric(params["weight_goal_lbs"])
+        params["height_cm"] = nutrition.convert_height_to_metric(params["height_inches"])
+        params["current_weight_kg"] = nutrition.convert_weight_to_metric(params["current_weight_lbs"])
+        params["weight_goal_kg"] = nutrition.convert_weight_to_metric(params["weight_goal_lbs"])
 
     return params
 
 
-async def get_user_personal_info_model_to_dict(user: User) -> dict[str, Any]:
-    current_weight = sorted(user.current_weight, key=lambda x: x.created_at, reverse=True)[0]
-    weight_goal = sorted(user.weight_goal, key=lambda x: x.created_at, reverse=True)[0]
+def create_user_profile(user: User) -> UserProfile:
+    current_weight = get_latest_weight_record(user.current_weight)
+    bmr, calories_goal = get_bmr_and_total_calories_goal(
+        {
+            "current_weight_kg": current_weight.weight_kg,
+            "height_cm": user.height_cm,
+        },
+        PatchPersonalInfo(
+            activity_level=user.activity_level,
+            goal=user.goal,
+            biological_sex=user.biological_sex,
+            age=relativedelta(datetime.datetime.now(), user.birth_year).years,
+        ),
+    )
+    return UserProfile(user, bmr, calories_goal)
+
+
+def start_profile_load(user_id: str) -> int:
+    profile_loads[user_id] = profile_loads.get(user_id, 0) + 1
+    return profile_versions.setdefault(user_id, 0)
+
+
+def finish_profile_load(user_id: str, version: int, profile: UserProfile | None) -> None:
+    if profile is not None and profile_versions[user_id] == version:
+        user_profiles.set(user_id, profile)
+
+    profile_loads[user_id] -= 1
+    if not profile_loads[user_id]:
+        del profile_loads[user_id]
+        del profile_versions[user_id]
+
+
+def invalidate_user_profile(user_id: str) -> None:
+    if user_id in profile_versions:
+        profile_versions[user_id] += 1
+
+
+@single_flight("user_profile")
+async def load_user_profile(user_id: str) -> UserProfile | None:
+    version = start_profile_load(user_id)
+    profile = None
+    try:
+        user = await datastore.run(User.get_by_id, user_id)
+        if user:
+            profile = create_user_profile(user)
+
+        return profile
+    finally:
+        finish_profile_load(user_id, version, profile)
+
+
+async def get_user_profile(user_id: str) -> UserProfile | None:
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        profile = await load_user_profile(user_id)
+
+    return profile
+
+
+async def get_user_personal_info_model_to_dict(profile: UserProfile) -> dict[str, Any]:
+    user = profile.user
+    is_metric = user.measurement_system == enums.MeasurementSystem.metric.value
 
     return {
         "email": user.email,
         "name": user.name,
         "personal_info": {
-            "age": relativedelta(datetime.datetime.now(), user.birth_year).years,
+            "age": profile.age,
             "goal": user.goal,
             "biological_sex": user.biological_sex,
             "measurement_system": user.measurement_system,
             "activity_level": user.activity_level,
-            "height": user.height_cm
-            if user.measurement_system == enums.MeasurementSystem.metric.value
-            else user.height_inches,
-            "current_weight": current_weight.weight_kg
-            if user.measurement_system == enums.MeasurementSystem.metric.value
-            else current_weight.weight_lbs,
-            "weight_goal": weight_goal.weight_kg
-            if user.measurement_system == enums.MeasurementSystem.metric.value
-            else weight_goal.weight_lbs,
+            "height": user.height_cm if is_metric else user.height_inches,
+            "current_weight": profile.current_weight.weight_kg if is_metric else profile.current_weight.weight_lbs,
+            "weight_goal": profile.weight_goal.weight_kg if is_metric else profile.weight_goal.weight_lbs,
             "meal_prep_time": user.meal_prep_time,
             "protein_goal": user.protein_goal,
             "avoid_ingredients": user.avoid_foods,
@@ -97,16 +180,48 @@ async def get_user_personal_info_model_to_dict(user: User) -> dict[str, Any]:
     }
 
 
-async def get_user_personal_info_from_db(user_id: str) -> dict[str, Any] | None:
+def _store_calories_goal(user_id: str) -> UserProfile | None:
     user = User.get_by_id(user_id)
     if not user:
         return None
 
-    return await get_user_personal_info_model_to_dict(user)
+    profile = create_user_profile(user)
+    if profile.is_outdated:
+        user.bmr = profile.bmr
+        user.calories_goal = profile.calories_goal
+        user.put()
+
+    return profile
+
+
+async def store_calories_goal(user_id: str) -> UserProfile:
+    """
+    Writes the derived BMR and calories goal back to the user. The cached profile may be stale, so the user is
+    re-read and written in one transaction instead of putting the cached entity; a concurrent personal info update
+    makes the transaction retry on the new state rather than being overwritten.
+    """
+    version = start_profile_load(user_id)
+    profile = None
+    try:
+        profile = await datastore.run(ndb.transaction, functools.partial(_store_calories_goal, user_id))
+        if not profile:
+            raise custom_exceptions.NotFoundException("User not found")
+
+        return profile
+    finally:
+        finish_profile_load(user_id, version, profile)
+
+
+async def get_user_personal_info_from_db(user_id: str) -> dict[str, Any] | None:
+    profile = await get_user_profile(user_id)
+    if not profile:
+        return None
+
+    return await get_user_personal_info_model_to_dict(profile)
 
 
 async def update_user_personal_info(user_id: str, data: dict[str, Any]) -> dict[str, Any] | None:
-    user = User.get_by_id(user_id)
+    user = await datastore.run(User.get_by_id, user_id)
     if not user:
         return None
 
@@ -115,8 +230,8 @@ async def update_user_personal_info(user_id: str, data: dict[str, Any]) -> dict[
         del data["age"]
 
     measurement_system = data["measurement_system"].value if "measurement_system" in data else user.measurement_system
-    current_weight = sorted(user.current_weight, key=lambda x: x.created_at, reverse=True)[0]
-    weight_goal = sorted(user.weight_goal, key=lambda x: x.created_at, reverse=True)[0]
+    current_weight = get_latest_weight_record(user.current_weight)
+    weight_goal = get_latest_weight_record(user.weight_goal)
     current_weight = (
         current_weight.weight_kg
         if measurement_system == enums.MeasurementSystem.metric.value
@@ -126,7 +241,7 @@ async def update_user_personal_info(user_id: str, data: dict[str, Any]) -> dict[
         weight_goal.weight_kg if measurement_system == enums.MeasurementSystem.metric.value else weight_goal.weight_lbs
     )
 
-    body_params = await calculate_weight_and_height(
+    body_params = calculate_weight_and_height(
         PatchPersonalInfo(
             measurement_system=measurement_system,
             height=data.get("height")
@@ -142,14 +257,14 @@ async def update_user_personal_info(user_id: str, data: dict[str, Any]) -> dict[
         del data["height"]
 
     if "current_weight" in data:
-        user.current_weight = user.current_weight + [await get_weight_record(body_params, "current_weight")]
+        user.current_weight = user.current_weight + [get_weight_record(body_params, "current_weight")]
         del data["current_weight"]
 
     if "weight_goal" in data:
-        user.weight_goal = user.weight_goal + [await get_weight_record(body_params, "weight_goal")]
+        user.weight_goal = user.weight_goal + [get_weight_record(body_params, "weight_goal")]
         del data["weight_goal"]
 
-    bmr, calories_goal = await get_bmr_and_total_calories_goal(
+    bmr, calories_goal = get_bmr_and_total_calories_goal(
         body_params,
         PatchPersonalInfo(
             activity_level=data.get("activity_level") or user.activity_level,
@@ -165,15 +280,22 @@ async def update_user_personal_info(user_id: str, data: dict[str, Any]) -> dict[
     for key, value in data.items():
         setattr(user, key, value)
 
-    user_key = user.put()
-    return await get_user_personal_info_model_to_dict(user_key.get())
+    await datastore.run(user.put)
+    invalidate_user_profile(user_id)
+
+    profile = UserProfile(user, bmr, calories_goal)
+    user_profiles.set(user_id, profile)
+    return await get_user_personal_info_model_to_dict(profile)
 
 
 async def create_reset_password_request(request: Request, db_client: Database) -> None:
     try:
-        user = User.get_by_id(request.state.user_id)
+        profile = await get_user_profile(request.state.user_id)
+        if not profile:
+            raise custom_exceptions.NotFoundException("User not found")
+
         db_client.change_password(
-            email=user.email,
+            email=profile.user.email,
             connection=settings.AUTH0_DEFAULT_DB_CONNECTION,
         )
     except Auth0Error as e:
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+
+import pytest
+from mealhow_sdk import enums, helpers
+
+from core import nutrition
+from schemas.user import BiologicalSex
+
+WEIGHTS_KG = (45, 70.5, 120)
+HEIGHTS_CM = (150, 175, 201)
+AGES = (18, 40, 85)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def adjustments() -> None:
+    asyncio.run(nutrition.load_adjustments())
+
+
+async def get_sdk_bmr_and_calories_goal(
+    weight_kg: float,
+    height_cm: float,
+    age: int,
+    sex: BiologicalSex,
+    activity_level: enums.ActivityLevel,
+    goal: enums.Goal,
+) -> tuple[int, int]:
+    bmr_hb = await helpers.get_basal_metabolic_rate_harris_benedict(
+        weight=weight_kg, height=height_cm, age=age, sex=sex
+    )
+    bmr_msj = await helpers.get_basal_metabolic_rate_mifflin_st_jeor(
+        weight=weight_kg, height=height_cm, age=age, sex=sex
+    )
+    bmr = int(round((bmr_hb + bmr_msj) / 2))
+    calories_goal = await helpers.get_calories_goal_by_activity_level(bmr, activity_level)
+    calories_goal = await helpers.get_calories_goal_by_goal_type(calories_goal, goal)
+    return bmr, await helpers.round_calories_goal_to_nearest_100(calories_goal)
+
+
+def get_profiles() -> list[tuple]:
+    return list(itertools.product(WEIGHTS_KG, HEIGHTS_CM, AGES, BiologicalSex, enums.ActivityLevel, enums.Goal))
+
+
+def test_bmr_and_calories_goal_match_the_sdk() -> None:
+    for weight_kg, height_cm, age, sex, activity_level, goal in get_profiles():
+        bmr = nutrition.get_bmr(weight_kg=weight_kg, height_cm=height_cm, age=age, sex=sex)
+        calories_goal = nutrition.get_calories_goal(bmr, activity_level, goal)
+
+        expected = asyncio.run(get_sdk_bmr_and_calories_goal(weight_kg, height_cm, age, sex, activity_level, goal))
+        assert (bmr, calories_goal) == expected
+
+
+def test_batch_matches_the_scalar_calculation() -> None:
+    profiles = get_profiles()
+
+    bmrs, calories_goals = nutrition.get_bmr_and_calories_goal_batch(*zip(*profiles))
+
+    for (weight_kg, height_cm, age, sex, activity_level, goal), bmr, calories_goal in zip(
+        profiles, bmrs, calories_goals
+    ):
+        expected_bmr = nutrition.get_bmr(weight_kg=weight_kg, height_cm=height_cm, age=age, sex=sex)
+        assert (bmr, calories_goal) == (expected_bmr, nutrition.get_calories_goal(expected_bmr, activity_level, goal))
+
+
+def test_conversions_and_bmi_match_the_sdk() -> None:
+    async def run() -> None:
+        for value in (0, 1, 63.5, 180, 250.2):
+            assert nutrition.convert_height_to_imperial(value) == await helpers.convert_height_to_imperial(value)
+            assert nutrition.convert_height_to_metric(value) == await helpers.convert_height_to_metric(value)
+            assert nutrition.convert_weight_to_imperial(value) == await helpers.convert_weight_to_imperial(value)
+            assert nutrition.convert_weight_to_metric(value) == await helpers.convert_weight_to_metric(value)
+
+        for weight_kg, height_cm in itertools.product(WEIGHTS_KG, HEIGHTS_CM):
+            assert nutrition.get_bmi(weight_kg, height_cm) == await helpers.get_bmi(weight_kg, height_cm)
+
+    asyncio.run(run())
+
+
+def test_calories_goal_requires_loaded_adjustments(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(nutrition, "ACTIVITY_LEVEL_ADJUSTMENTS", {})
+
+    with pytest.raises(RuntimeError, match="load_adjustments"):
+        nutrition.get_calories_goal(1500, list(enums.ActivityLevel)[0], list(enums.Goal)[0])
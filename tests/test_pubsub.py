@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import Future
+from typing import Any
+
+import pytest
+from google.api_core.exceptions import NotFound, PermissionDenied
+
+from core import pubsub
+from core.custom_exceptions import ServiceUnavailableException
+from core.pubsub import EventPublisher
+
+
+class FakePublisherClient:
+    """
+    Stands in for the Pub/Sub emulator: publishes resolve right away with sequential message ids,
+    unless the topic does not exist or a failure is queued.
+    """
+
+    def __init__(self, topics: set[str], failures: int = 0, can_get_topic: bool = True) -> None:
+        self.topics = topics
+        self.can_get_topic = can_get_topic
+        self.failures = failures
+        self.published: list[tuple[str, bytes, str]] = []
+        self.resumed: list[tuple[str, str]] = []
+        self.stopped = False
+
+    def topic_path(self, project: str, topic_id: str) -> str:
+        return f"projects/{project}/topics/{topic_id}"
+
+    def get_topic(self, topic: str) -> dict[str, str]:
+        if not self.can_get_topic:
+            raise PermissionDenied("User not authorized to perform this action")
+        if topic not in self.topics:
+            raise NotFound(f"Topic {topic} not found")
+
+        return {"name": topic}
+
+    def publish(self, topic: str, data: bytes, ordering_key: str = "") -> Future:
+        future: Future = Future()
+        if topic not in self.topics:
+            future.set_exception(NotFound(f"Topic {topic} not found"))
+        elif self.failures:
+            self.failures -= 1
+            future.set_exception(RuntimeError("Publish failed"))
+        else:
+            self.published.append((topic, data, ordering_key))
+            future.set_result(str(len(self.published)))
+
+        return future
+
+    def resume_publish(self, topic: str, ordering_key: str) -> None:
+        self.resumed.append((topic, ordering_key))
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+def create_event_publisher(
+    topic_ids: list[str], failures: int = 0, can_get_topic: bool = True
+) -> tuple[EventPublisher, list[FakePublisherClient]]:
+    clients = []
+
+    def client_factory(options: dict[str, Any]) -> FakePublisherClient:
+        topics = {f"projects/{pubsub.settings.PROJECT_ID}/topics/{topic_id}" for topic_id in topic_ids}
+        client = FakePublisherClient(topics, failures, can_get_topic)
+        clients.append(client)
+        return client
+
+    return EventPublisher(client_factory), clients
+
+
+@pytest.fixture
+def ordered_publishing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pubsub.settings, "PUBSUB_ENABLE_MESSAGE_ORDERING", True)
+
+
+def test_publish_returns_message_id(ordered_publishing: None) -> None:
+    event_publisher, clients = create_event_publisher(["events"])
+
+    message_id = asyncio.run(event_publisher.publish("events", b"{}", ordering_key="user"))
+
+    assert message_id == "1"
+    assert clients[0].published == [(f"projects/{pubsub.settings.PROJECT_ID}/topics/events", b"{}", "user")]
+
+
+def test_publish_drops_ordering_key_when_ordering_is_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pubsub.settings, "PUBSUB_ENABLE_MESSAGE_ORDERING", False)
+    event_publisher, clients = create_event_publisher(["events"])
+
+    asyncio.run(event_publisher.publish("events", b"{}", ordering_key="user"))
+
+    assert clients[0].published[0][2] == ""
+
+
+def test_failed_publish_resumes_ordering_key(ordered_publishing: None) -> None:
+    event_publisher, clients = create_event_publisher(["events"], failures=1)
+
+    async def publish_twice() -> str:
+        with pytest.raises(ServiceUnavailableException):
+            await event_publisher.publish("events", b"{}", ordering_key="user")
+
+        return await event_publisher.publish("events", b"{}", ordering_key="user")
+
+    assert asyncio.run(publish_twice()) == "1"
+    assert clients[0].resumed == [(f"projects/{pubsub.settings.PROJECT_ID}/topics/events", "user")]
+
+
+def test_each_topic_gets_its_own_client() -> None:
+    event_publisher, clients = create_event_publisher(["first", "second"])
+
+    assert event_publisher.get_topic_publisher("first") is event_publisher.get_topic_publisher("first")
+    assert (
+        event_publisher.get_topic_publisher("second").client is not event_publisher.get_topic_publisher("first").client
+    )
+    assert len(clients) == 2
+
+
+def test_register_topics_fails_on_missing_topic(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pubsub.settings, "PUBSUB_VALIDATE_TOPICS_ON_STARTUP", True)
+    event_publisher, _ = create_event_publisher(["events"])
+
+    asyncio.run(event_publisher.register_topics(["events"]))
+    with pytest.raises(RuntimeError, match="does not exist"):
+        asyncio.run(event_publisher.register_topics(["missing"]))
+
+
+def test_register_topics_explains_missing_permission(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pubsub.settings, "PUBSUB_VALIDATE_TOPICS_ON_STARTUP", True)
+    event_publisher, _ = create_event_publisher(["events"], can_get_topic=False)
+
+    with pytest.raises(RuntimeError, match="pubsub.topics.get"):
+        asyncio.run(event_publisher.register_topics(["events"]))
+
+
+def test_register_topics_skips_validation_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pubsub.settings, "PUBSUB_VALIDATE_TOPICS_ON_STARTUP", False)
+    event_publisher, _ = create_event_publisher(["events"], can_get_topic=False)
+
+    asyncio.run(event_publisher.register_topics(["events"]))
+
+    assert "events" in event_publisher.topics
+
+
+def test_stop_flushes_every_client() -> None:
+    event_publisher, clients = create_event_publisher(["first", "second"])
+    event_publisher.get_topic_publisher("first")
+    event_publisher.get_topic_publisher("second")
+
+    asyncio.run(event_publisher.stop())
+
+    assert all(client.stopped for client in clients)
+    assert event_publisher.topics == {}
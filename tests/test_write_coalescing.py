@@ -0,0 +1,189 @@
+import asyncio
+from typing import Any
+
+from core.write_coalescing import WriteCoalescer
+
+
+class FakeDatastore:
+    """
+    Stands in for `put_multi`: records every written batch, fails the first `failures` writes and, while `gate`
+    is cleared, holds writes in flight.
+    """
+
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.batches: list[list[Any]] = []
+        self.attempts = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def put_multi(self, entities: list[Any]) -> None:
+        self.attempts += 1
+        await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Datastore unavailable")
+
+        self.batches.append(entities)
+
+
+async def wait_for_write(datastore: FakeDatastore) -> None:
+    while not datastore.attempts:
+        await asyncio.sleep(0)
+
+
+def create_writer(datastore: FakeDatastore, max_batch_size: int = 500, retries: int = 2) -> WriteCoalescer:
+    return WriteCoalescer(
+        "test", max_batch_size=max_batch_size, retries=retries, retry_delay=0, write=datastore.put_multi
+    )
+
+
+def test_put_returns_once_written() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+
+        await writer.put("user", {"a": "a1", "b": "b1"})
+
+        assert datastore.batches == [["a1", "b1"]]
+        assert not writer.pending and not writer.writers
+
+    asyncio.run(run())
+
+
+def test_puts_during_a_write_are_merged_into_the_next_one() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+        datastore.gate.clear()
+
+        first = asyncio.create_task(writer.put("user", {"a": "a1"}))
+        await wait_for_write(datastore)
+        merged = [
+            asyncio.create_task(writer.put("user", {"a": "a2"})),
+            asyncio.create_task(writer.put("user", {"b": "b1"})),
+            asyncio.create_task(writer.put("user", {"a": "a3"})),
+        ]
+        await asyncio.sleep(0)
+        datastore.gate.set()
+        await asyncio.gather(first, *merged)
+
+        assert datastore.batches == [["a1"], ["a3", "b1"]]
+
+    asyncio.run(run())
+
+
+def test_users_are_written_independently() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+
+        await asyncio.gather(writer.put("first", {"a": "first-a"}), writer.put("second", {"a": "second-a"}))
+
+        assert sorted(map(tuple, datastore.batches)) == [("first-a",), ("second-a",)]
+
+    asyncio.run(run())
+
+
+def test_failed_write_is_retried() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore(failures=2)
+        writer = create_writer(datastore, retries=2)
+
+        await writer.put("user", {"a": "a1"})
+
+        assert datastore.attempts == 3
+        assert datastore.batches == [["a1"]]
+
+    asyncio.run(run())
+
+
+def test_exhausted_retries_fail_every_caller_of_the_batch() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore(failures=4)
+        writer = create_writer(datastore, retries=1)
+        datastore.gate.clear()
+
+        first = asyncio.create_task(writer.put("user", {"a": "a1"}))
+        await wait_for_write(datastore)
+        merged = [
+            asyncio.create_task(writer.put("user", {"a": "a2"})),
+            asyncio.create_task(writer.put("user", {"b": "b1"})),
+        ]
+        await asyncio.sleep(0)
+        datastore.gate.set()
+        results = await asyncio.gather(first, *merged, return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert datastore.batches == []
+        assert not writer.writers
+
+    asyncio.run(run())
+
+
+def test_large_batches_are_split() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore, max_batch_size=2)
+
+        await writer.put("user", {key: key for key in range(5)})
+
+        assert datastore.batches == [[0, 1], [2, 3], [4]]
+
+    asyncio.run(run())
+
+
+def test_stop_waits_for_in_flight_and_merged_writes() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+        datastore.gate.clear()
+
+        first_puts = [
+            asyncio.create_task(writer.put("user", {"a": "a1"})),
+            asyncio.create_task(writer.put("other", {"a": "other-a"})),
+        ]
+        await wait_for_write(datastore)
+        merged = asyncio.create_task(writer.put("user", {"b": "b1"}))
+        await asyncio.sleep(0)
+        stop = asyncio.create_task(writer.stop())
+        await asyncio.sleep(0)
+        assert not stop.done()
+
+        datastore.gate.set()
+        await stop
+
+        assert sorted(map(tuple, datastore.batches)) == [("a1",), ("b1",), ("other-a",)]
+        assert not writer.pending and not writer.writers
+        await asyncio.gather(*first_puts, merged)
+
+    asyncio.run(run())
+
+
+def test_put_of_nothing_does_not_write() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+
+        await writer.put("user", {})
+
+        assert datastore.attempts == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_write() -> None:
+    async def run() -> None:
+        datastore = FakeDatastore()
+        writer = create_writer(datastore)
+        datastore.gate.clear()
+
+        put = asyncio.create_task(writer.put("user", {"a": "a1"}))
+        await asyncio.sleep(0)
+        put.cancel()
+        datastore.gate.set()
+        await writer.stop()
+
+        assert datastore.batches == [["a1"]]
+
+    asyncio.run(run())